@@ -0,0 +1,322 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import warnings
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from response_cache import FAILED_ANSWER_RE
+from timing import percentile
+
+# Batch mode for regression runs: reads prompts, conversations or direct tool
+# calls from a JSONL file, runs them through the same tools and agent as the
+# chat on a pool of worker processes, and appends one result line per item to
+# the output file as soon as it finishes. Input lines look like
+#
+#   {"id": "q1", "prompt": "Do you have any SUVs under $25k?"}
+#   {"id": "c1", "turns": ["Tell me about the Honda Vezel", "how does it compare with other dealers?"]}
+#   {"id": "t1", "tool": "compare_prices", "input": "honda vezel"}
+#
+# (a bare string or list works too; items without an id are numbered by line).
+# The output doubles as the checkpoint: a rerun skips items already answered
+# and retries the ones that failed. Workers share one SQLite search cache.
+
+# Stock tools that can be called directly, by their chat_core function names
+TOOL_FUNCTIONS = ("get_car_details", "compare_prices", "why_buy_from_us", "list_available_cars", "get_car_price",
+                  "search_inventory")
+NO_INPUT_TOOLS = ("list_available_cars",)
+# What each fast-path route calls instead of going through the agent
+ROUTE_TOOLS = {"list": "list_available_cars", "details": "get_car_details", "price": "get_car_price"}
+
+
+def parse_item(line_number, line):
+    item = json.loads(line)
+    if isinstance(item, str):
+        item = {"prompt": item}
+    elif isinstance(item, list):
+        item = {"turns": item}
+    if not isinstance(item, dict):
+        raise ValueError("expected an object, a string or a list of prompts")
+    item.setdefault("id", f"line-{line_number}")
+    item["id"] = str(item["id"])
+    if "tool" in item:
+        if item["tool"] not in TOOL_FUNCTIONS:
+            raise ValueError(f"unknown tool {item['tool']!r}; expected one of {', '.join(TOOL_FUNCTIONS)}")
+    elif "prompt" in item:
+        item["turns"] = [item.pop("prompt")]
+    if "tool" not in item and not (isinstance(item.get("turns"), list) and item["turns"]
+                                   and all(isinstance(turn, str) for turn in item["turns"])):
+        raise ValueError("expected \"prompt\", \"turns\" or \"tool\"")
+    return item
+
+
+# Items from the input file; lines that cannot be parsed come back as
+# (id, error) so they are reported without stopping the run
+def read_items(path):
+    items, invalid = [], []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(parse_item(line_number, line))
+            except ValueError as e:
+                invalid.append((f"line-{line_number}", str(e)))
+    return items, invalid
+
+
+# Ids already answered in an existing output file; a cut-off last line is ignored
+def read_checkpoint(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+
+# --- Worker process ---
+
+_worker = {}
+
+
+def _init_worker(fake, llm_latency, search_latency):
+    import chat_core
+    import langchain.agents  # noqa: F401
+    from langchain_core._api import LangChainDeprecationWarning
+    # langchain installs its own filter on import, so this has to come after it
+    warnings.simplefilter("ignore", LangChainDeprecationWarning)
+    if fake:
+        from fake_backends import FakeChatModel, FakeSearchClient
+        chat_core.configure(llm=FakeChatModel(latency=llm_latency, models=list(chat_core.used_car_stock)),
+                            search_client=FakeSearchClient(latency=search_latency))
+    _worker["chat_core"] = chat_core
+
+
+def _tool_recorder():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class ToolRecorder(BaseCallbackHandler):
+        run_inline = True
+
+        def __init__(self):
+            self.calls = []
+
+        def on_tool_start(self, serialized, input_str, **kwargs):
+            self.calls.append({"tool": (serialized or {}).get("name", "tool"), "input": str(input_str).strip()})
+
+    return ToolRecorder()
+
+
+def _reply_fields(results):
+    if isinstance(results, dict):
+        return {"reply": results.get("details", ""), "images": results.get("images", [])}
+    return {"reply": str(results)}
+
+
+def _run_tool(chat_core, item, turns):
+    tool, tool_input = item["tool"], str(item.get("input", ""))
+    started = time.perf_counter()
+    results = getattr(chat_core, tool)() if tool in NO_INPUT_TOOLS else getattr(chat_core, tool)(tool_input)
+    turns.append({"tool": tool, "input": tool_input, **_reply_fields(results),
+                  "latency_ms": (time.perf_counter() - started) * 1000,
+                  "tool_calls": [{"tool": tool, "input": tool_input}]})
+
+
+# Turns finished before a failure stay in `turns`
+def _run_conversation(chat_core, item, turns):
+    session = chat_core.ChatSession(f"batch-{item['id']}")
+    try:
+        for prompt in item["turns"]:
+            recorder = _tool_recorder()
+            started = time.perf_counter()
+            results, turn_metrics = session.respond(prompt, [recorder])
+            tool_calls = recorder.calls
+            if turn_metrics["route"] in ROUTE_TOOLS:
+                tool_calls = [{"tool": ROUTE_TOOLS[turn_metrics["route"]], "input": prompt}]
+            turns.append({
+                "prompt": prompt,
+                **_reply_fields(results),
+                "route": turn_metrics["route"],
+                "latency_ms": (time.perf_counter() - started) * 1000,
+                "tool_calls": tool_calls,
+                "llm_calls": turn_metrics.get("llm_calls", 0),
+                "prompt_tokens": turn_metrics.get("prompt_tokens", 0),
+                "completion_tokens": turn_metrics.get("completion_tokens", 0),
+            })
+    finally:
+        session.transcript.discard()
+
+
+# Runs one item in a worker; failures become error results
+def run_item(item):
+    chat_core = _worker["chat_core"]
+    started = time.perf_counter()
+    result = {"id": item["id"], "worker": os.getpid()}
+    turns = []
+    try:
+        if "tool" in item:
+            _run_tool(chat_core, item, turns)
+        else:
+            _run_conversation(chat_core, item, turns)
+        result["status"] = "ok"
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["latency_ms"] = (time.perf_counter() - started) * 1000
+    result["turns"] = turns
+    result["tool_calls"] = [call["tool"] for turn in turns for call in turn["tool_calls"]]
+    result["tokens"] = {key: sum(turn.get(key, 0) for turn in turns)
+                        for key in ("llm_calls", "prompt_tokens", "completion_tokens")}
+    result["degraded"] = any(FAILED_ANSWER_RE.search(turn["reply"]) for turn in turns)
+    return result
+
+
+# --- Parent process ---
+
+class Summary:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.results = Counter()
+        self.item_ms = []
+        self.turn_ms = []
+        self.routes = Counter()
+        self.tools = Counter()
+        self.tokens = Counter()
+        self.errors = Counter()
+
+    def add(self, result):
+        self.results[result["status"]] += 1
+        self.results["degraded"] += result.get("degraded", False)
+        if result["status"] != "ok":
+            self.errors[result["error"].split(":", 1)[0]] += 1
+            return
+        self.item_ms.append(result["latency_ms"])
+        for turn in result["turns"]:
+            self.turn_ms.append(turn["latency_ms"])
+            self.routes[turn.get("route", "tool")] += 1
+        self.tools.update(result["tool_calls"])
+        self.tokens.update(result["tokens"])
+
+    def print(self, skipped):
+        elapsed = time.perf_counter() - self.started
+        total = self.results["ok"] + self.results["error"]
+        print(f"\n{total} items in {elapsed:.1f} s ({skipped} already done): "
+              f"{total / elapsed if elapsed else 0:.2f} items/s, {len(self.turn_ms) / elapsed if elapsed else 0:.2f} turns/s")
+        print(f"failures: {self.results['error']} ({self.results['error'] / total if total else 0:.1%}), "
+              f"degraded answers: {self.results['degraded']}")
+        for name, samples in (("item", self.item_ms), ("turn", self.turn_ms)):
+            if samples:
+                print(f"{name} latency: p50 {percentile(samples, 50):.0f} ms, p95 {percentile(samples, 95):.0f} ms, "
+                      f"p99 {percentile(samples, 99):.0f} ms")
+        if self.routes:
+            print("routes: " + ", ".join(f"{route} {count}" for route, count in self.routes.most_common()))
+        if self.tools:
+            print("tool calls: " + ", ".join(f"{tool} {count}" for tool, count in self.tools.most_common()))
+        turns = len(self.turn_ms)
+        print(f"tokens: {self.tokens['prompt_tokens']:,} prompt / {self.tokens['completion_tokens']:,} completion "
+              f"in {self.tokens['llm_calls']:,} LLM calls"
+              + (f", {(self.tokens['prompt_tokens'] + self.tokens['completion_tokens']) / turns:.0f} per turn"
+                 if turns else ""))
+        for error, count in self.errors.most_common(5):
+            print(f"error: {error} x{count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of questions through the chat pipeline.")
+    parser.add_argument("input", help="JSONL file of prompts, conversations or tool calls")
+    parser.add_argument("output", help="JSONL results file; also the checkpoint for resuming")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="worker processes")
+    parser.add_argument("--search-cache", help="SQLite search cache shared by the workers "
+                                               "(default: SEARCH_CACHE_DB, or <output>.search-cache.db)")
+    parser.add_argument("--restart", action="store_true", help="ignore the existing output and start over")
+    parser.add_argument("--limit", type=int, default=0, help="only run the first N pending items")
+    parser.add_argument("--no-fast-path", action="store_true", help="send every prompt to the agent")
+    parser.add_argument("--no-response-cache", action="store_true", help="answer repeated prompts with the agent too")
+    parser.add_argument("--fake", action="store_true", help="use the offline fake LLM and search backends")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.4, help="seconds per fake search")
+    args = parser.parse_args()
+
+    # Workers read their settings from the environment when chat_core is imported.
+    # Market snapshots are off so the workers do not each refresh the whole
+    # stock; comparisons search live through the shared cache instead.
+    os.environ["SEARCH_CACHE_DB"] = args.search_cache or os.environ.get("SEARCH_CACHE_DB") or f"{args.output}.search-cache.db"
+    os.environ["MARKET_REFRESH_SECONDS"] = "0"
+    os.environ["IMAGE_CACHE_MB"] = "0"
+    os.environ["AGENT_VERBOSE"] = "0"
+    if args.no_fast_path:
+        os.environ["FAST_PATH"] = "0"
+    if args.no_response_cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    if args.fake:
+        os.environ.setdefault("GOOGLE_API_KEY", "offline")
+        os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+    items, invalid = read_items(args.input)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = read_checkpoint(args.output)
+    pending = [item for item in items if item["id"] not in done]
+    if args.limit:
+        pending = pending[:args.limit]
+    print(f"{len(items)} items in {args.input}, {len(done)} already done, {len(pending)} to run "
+          f"on {args.workers} workers; search cache {os.environ['SEARCH_CACHE_DB']}")
+
+    summary = Summary()
+    with open(args.output, "a+") as out:
+        # Start on a fresh line if the previous run was cut off mid-write
+        if out.tell():
+            out.seek(out.tell() - 1)
+            if out.read(1) != "\n":
+                out.write("\n")
+
+        def write(result):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            summary.add(result)
+
+        for item_id, error in invalid:
+            if item_id not in done:
+                write({"id": item_id, "status": "error", "error": f"InvalidItem: {error}", "latency_ms": 0.0,
+                       "turns": [], "tool_calls": [], "tokens": {}})
+
+        # Spawned workers start without the parent's threads; at most a few
+        # items per worker are queued so an interrupted run loses little
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(args.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(args.fake, args.llm_latency, args.search_latency)) as pool:
+            queue = iter(pending)
+            running = set()
+            completed = 0
+            try:
+                while True:
+                    while len(running) < args.workers * 2:
+                        item = next(queue, None)
+                        if item is None:
+                            break
+                        running.add(pool.submit(run_item, item))
+                    if not running:
+                        break
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write(future.result())
+                    if (completed + len(finished)) // 100 > completed // 100:
+                        print(f"... {completed + len(finished)} of {len(pending)} done")
+                    completed += len(finished)
+            except KeyboardInterrupt:
+                print("interrupted; rerun the same command to continue")
+                pool.shutdown(wait=False, cancel_futures=True)
+    summary.print(len(done))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Offline load test for the HTTP chat API with fake Gemini and Tavily backends.
+
+    python benchmarks/bench_api.py --workers 2 --clients 16
+
+Starts chat_api.py in fake mode with a SQLite session store, replays the
+scripted conversations from bench_chat.py through POST /chat/stream from
+concurrent clients, and reports throughput, time to first event, time to
+first answer token and turn latency. Every conversation is checked against
+GET /sessions/{id} afterwards, so turns served by different workers must
+land in the same session.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_chat import CONVERSATIONS, Recorder, print_table, summarize  # noqa: E402
+
+
+def start_server(args, workdir):
+    env = dict(os.environ, AGENT_VERBOSE="0", SESSION_STORE="sqlite", SESSION_DB=os.path.join(workdir, "sessions.db"),
+               IMAGE_CACHE_DIR=os.path.join(workdir, "images"), TRANSCRIPT_DIR=os.path.join(workdir, "transcripts"),
+               SEARCH_CACHE_DB="", LEADS_CSV=os.path.join(workdir, "leads.csv"),
+               FAKE_TOKEN_LATENCY=str(args.token_latency))
+    command = [sys.executable, os.path.join(ROOT, "chat_api.py"), "--fake", "--port", str(args.port),
+               "--workers", str(args.workers), "--llm-latency", str(args.llm_latency),
+               "--search-latency", str(args.search_latency)]
+    log = open(os.path.join(workdir, "server.log"), "w")
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{args.url}/healthz", timeout=1).read()
+            return server
+        except (urllib.error.URLError, ConnectionError):
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f"server did not start, see {log.name}")
+
+
+def post(url, body):
+    return urllib.request.Request(url, data=json.dumps(body).encode(), method="POST",
+                                  headers={"Content-Type": "application/json"})
+
+
+# One streamed turn: (payload of the "done" event, ms to first event, ms to first token)
+def stream_turn(url, message, session_id):
+    body = {"message": message}
+    if session_id:
+        body["session_id"] = session_id
+    started = time.perf_counter()
+    first_event_ms = first_token_ms = None
+    event = None
+    with urllib.request.urlopen(post(f"{url}/chat/stream", body), timeout=120) as response:
+        for raw in response:
+            line = raw.decode().rstrip("\n")
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                if first_event_ms is None:
+                    first_event_ms = (time.perf_counter() - started) * 1000
+            elif line.startswith("data: "):
+                if event == "token" and first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                if event == "done":
+                    return json.loads(line[len("data: "):]), first_event_ms, first_token_ms
+                if event == "error":
+                    raise RuntimeError(json.loads(line[len("data: "):])["error"])
+    raise RuntimeError("stream ended without a reply")
+
+
+def run_conversation(url, conversation, turns, errors):
+    session_id = None
+    for prompt in conversation:
+        started = time.perf_counter()
+        try:
+            reply, first_event_ms, first_token_ms = stream_turn(url, prompt, session_id)
+        except Exception as e:
+            errors.append(f"{prompt!r}: {e}")
+            return None
+        session_id = reply["session_id"]
+        turns.add("all turns", (time.perf_counter() - started) * 1000)
+        turns.add(f"route: {reply['route']}", (time.perf_counter() - started) * 1000)
+        turns.add("first event", first_event_ms)
+        if first_token_ms is not None:
+            turns.add("first answer token", first_token_ms)
+    with urllib.request.urlopen(f"{url}/sessions/{session_id}", timeout=10) as response:
+        session = json.load(response)
+    if session["usage"]["turns"] != len(conversation):
+        errors.append(f"session {session_id}: {session['usage']['turns']} turns stored, {len(conversation)} sent")
+    return session_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2, help="API worker processes")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--conversations", type=int, default=0, help="conversations to replay (default: --clients)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds between streamed tokens")
+    parser.add_argument("--search-latency", type=float, default=0.4, help="seconds per fake search")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-api-")
+    server = None
+    if not args.url:
+        args.url = f"http://127.0.0.1:{args.port}"
+        started = time.perf_counter()
+        server = start_server(args, workdir)
+        print(f"server with {args.workers} workers ready in {time.perf_counter() - started:.1f} s")
+
+    total = args.conversations or args.clients
+    workload = [CONVERSATIONS[i % len(CONVERSATIONS)] for i in range(total)]
+    turns, errors = Recorder(), []
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            list(pool.map(lambda conv: run_conversation(args.url, conv, turns, errors), workload))
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    turn_count = len(turns.samples.get("all turns", []))
+    print_table("Streamed turns over HTTP", sorted((name, summarize(v)) for name, v in turns.samples.items()))
+    report = {
+        "workers": args.workers,
+        "clients": args.clients,
+        "conversations": total,
+        "turns": turn_count,
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_turns_per_s": turn_count / elapsed if elapsed else 0.0,
+        "latency": {name: summarize(v) for name, v in turns.samples.items()},
+    }
+    print(f"\n{turn_count} turns from {total} conversations over {args.clients} clients and {args.workers} workers "
+          f"in {elapsed:.2f} s: {report['throughput_turns_per_s']:.1f} turns/s, {len(errors)} errors")
+    for error in errors[:5]:
+        print(f"error: {error}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
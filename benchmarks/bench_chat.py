@@ -0,0 +1,286 @@
+"""Offline load test for the chat pipeline with fake Gemini and Tavily backends.
+
+    python benchmarks/bench_chat.py --sessions 8 --llm-latency 0.3 --search-latency 0.4
+
+Replays scripted conversations through the tools and through ChatSession
+(fast path + agent) without network access, and reports throughput,
+p50/p95/p99 turn latency, per-tool time and memory growth.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONVERSATIONS = [
+    ["What cars do you have?", "Tell me about the Honda Vezel",
+     "How does the honda vezel compare with other dealers?", "Why should I buy the Honda Vezel from you?"],
+    ["Do you have any SUVs under $25k?", "details on the Kia Sportage",
+     "compare prices for the kia sportage", "Hello, can you contact me on whatsapp?"],
+    ["price of the Mustang", "why buy the ford mustang from you",
+     "Tell me about the Porsche 911", "compare the porsche 911 with other dealers"],
+    ["Hi there", "I'm looking for something reliable for commuting",
+     "Tell me about the Toyota Corolla", "Why should I buy the toyota corolla from you?"],
+]
+TOOL_MODELS = ["honda vezel", "ford mustang", "audi a4", "tesla model 3", "jeep wrangler"]
+
+
+def load_conversations(path):
+    conversations = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                item = json.loads(line)
+                conversations.append(item["turns"] if isinstance(item, dict) else item)
+    return conversations
+
+
+def configure_environment(args):
+    # chat_core reads its settings at import time
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    os.environ.setdefault("TAVILY_API_KEY", "offline")
+    os.environ["AGENT_VERBOSE"] = "0"
+    os.environ["SEARCH_CACHE_SIZE"] = str(args.search_cache_size)
+    os.environ["SEARCH_CACHE_DB"] = ""
+    os.environ["SEARCH_TIMEOUT"] = str(args.search_timeout)
+    os.environ["ASYNC_TOOLS"] = "0" if args.sync_tools else "1"
+    os.environ["FAST_PATH"] = "0" if args.no_fast_path else "1"
+    if args.no_response_cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-images-")
+    os.environ["TRANSCRIPT_DIR"] = tempfile.mkdtemp(prefix="bench-transcripts-")
+    if args.no_market_prices:
+        os.environ["MARKET_REFRESH_SECONDS"] = "0"
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, ms):
+        with self._lock:
+            self.samples.setdefault(name, []).append(ms)
+
+
+def make_tool_timer(recorder):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class ToolTimer(BaseCallbackHandler):
+        run_inline = True
+
+        def __init__(self):
+            self._started = {}
+
+        def on_tool_start(self, serialized, input_str, run_id=None, **kwargs):
+            self._started[run_id] = ((serialized or {}).get("name", "tool"), time.perf_counter())
+
+        def on_tool_end(self, output, run_id=None, **kwargs):
+            name, started = self._started.pop(run_id, ("tool", time.perf_counter()))
+            recorder.add(name, (time.perf_counter() - started) * 1000)
+
+        def on_tool_error(self, error, run_id=None, **kwargs):
+            self.on_tool_end(None, run_id=run_id)
+
+    return ToolTimer()
+
+
+def summarize(values):
+    from timing import percentile
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values),
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+    }
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'name':<28} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in rows:
+        print(f"  {name:<28} {stats['count']:>6} {stats['mean_ms']:>9.1f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+
+# Sync and async variants each start from a cold search cache
+def replay_tools(chat_core, recorder, rounds):
+    import asyncio
+    variants = [
+        [("compare_prices", chat_core.compare_prices),
+         ("get_car_details", chat_core.get_car_details),
+         ("why_buy_from_us", chat_core.why_buy_from_us)],
+        [("acompare_prices", lambda m: asyncio.run(chat_core.acompare_prices(m))),
+         ("aget_car_details", lambda m: asyncio.run(chat_core.aget_car_details(m))),
+         ("awhy_buy_from_us", lambda m: asyncio.run(chat_core.awhy_buy_from_us(m)))],
+    ]
+    for calls in variants:
+        chat_core.search_cache.clear()
+        for _ in range(rounds):
+            for model in TOOL_MODELS:
+                for name, fn in calls:
+                    started = time.perf_counter()
+                    fn(model)
+                    recorder.add(name, (time.perf_counter() - started) * 1000)
+
+
+def run_session(chat_core, conversation, turns, tools, errors):
+    session = chat_core.ChatSession()
+    for prompt in conversation:
+        started = time.perf_counter()
+        try:
+            results, metrics = session.respond(prompt, [make_tool_timer(tools)])
+            route = metrics["route"]
+            if isinstance(results, dict) and results.get("images"):
+                # What the UI does next: fetch the thumbnails to render
+                render_started = time.perf_counter()
+                chat_core.car_images(results["images"])
+                tools.add("thumbnails at render", (time.perf_counter() - render_started) * 1000)
+        except Exception as e:
+            errors.append(f"{prompt!r}: {e}")
+            route = "error"
+        turns.add("all turns", (time.perf_counter() - started) * 1000)
+        turns.add(f"route: {route}", (time.perf_counter() - started) * 1000)
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent chat sessions")
+    parser.add_argument("--conversations", type=int, default=0,
+                        help="total conversations to replay (default: one per session)")
+    parser.add_argument("--script", help="JSONL file of conversations: {\"turns\": [prompt, ...]} per line")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--search-latency", type=float, default=0.4, help="seconds per fake search")
+    parser.add_argument("--search-jitter", type=float, default=0.2, help="extra random search latency")
+    parser.add_argument("--image-latency", type=float, default=0.3, help="seconds per fake image download")
+    parser.add_argument("--search-failure-rate", type=float, default=0.0)
+    parser.add_argument("--search-timeout", type=float, default=8.0)
+    parser.add_argument("--search-cache-size", type=int, default=256, help="0 disables the search cache")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="direct tool replays per model (0 to skip)")
+    parser.add_argument("--sync-tools", action="store_true", help="use the blocking tools instead of async ones")
+    parser.add_argument("--no-fast-path", action="store_true", help="send every prompt to the agent")
+    parser.add_argument("--no-response-cache", action="store_true", help="send repeated prompts to the agent too")
+    parser.add_argument("--no-market-prices", action="store_true",
+                        help="no background market-price refresh; comparisons search live")
+    parser.add_argument("--warmup", action="store_true",
+                        help="wait for the startup market-price refresh and image prefetch before timing")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    tracemalloc.start()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+
+    import chat_core
+    from fake_backends import FakeChatModel, FakeImageFetcher, FakeSearchClient
+    # Pay the agent and memory import cost before anything is timed
+    import conversation_memory  # noqa: F401
+    import langchain.agents  # noqa: F401
+    from langchain_core._api import LangChainDeprecationWarning
+    # langchain installs its own filter on import, so this has to come after it
+    warnings.simplefilter("ignore", LangChainDeprecationWarning)
+
+    search = FakeSearchClient(latency=args.search_latency, jitter=args.search_jitter,
+                              failure_rate=args.search_failure_rate)
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency,
+                        models=list(chat_core.used_car_stock))
+    image_fetch = FakeImageFetcher(latency=args.image_latency)
+    chat_core.configure(llm=llm, search_client=search, image_fetch=image_fetch)
+    if args.search_cache_size == 0:
+        chat_core.search_cache.max_entries = 0
+
+    if args.warmup:
+        started = time.perf_counter()
+        image_cache = chat_core.get_image_cache()
+        while chat_core.MARKET_REFRESH_SECONDS > 0 and not chat_core.get_market_prices().stats()["cycles"]:
+            time.sleep(0.05)
+        if image_cache and image_cache.prefetch_thread:
+            image_cache.prefetch_thread.join()
+        print(f"warmup: {time.perf_counter() - started:.1f} s")
+
+    conversations = load_conversations(args.script) if args.script else CONVERSATIONS
+    total = args.conversations or args.sessions
+    workload = [conversations[i % len(conversations)] for i in range(total)]
+
+    tools = Recorder()
+    if args.tool_rounds:
+        replay_tools(chat_core, tools, args.tool_rounds)
+        print_table("Direct tool calls", sorted((name, summarize(v)) for name, v in tools.samples.items()))
+        chat_core.search_cache.clear()
+
+    turns, agent_tools, errors = Recorder(), Recorder(), []
+    after_import_bytes = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        sessions = list(pool.map(lambda conv: run_session(chat_core, conv, turns, agent_tools, errors), workload))
+    elapsed = time.perf_counter() - started
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    turn_count = len(turns.samples.get("all turns", []))
+
+    print_table("Chat turns", sorted((name, summarize(v)) for name, v in turns.samples.items()))
+    if agent_tools.samples:
+        print_table("Tool time inside agent turns", sorted((name, summarize(v)) for name, v in agent_tools.samples.items()))
+    report = {
+        "sessions": args.sessions,
+        "conversations": total,
+        "turns": turn_count,
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_turns_per_s": turn_count / elapsed if elapsed else 0.0,
+        "turn_latency": summarize(turns.samples["all turns"]) if turn_count else None,
+        "routes": {name: summarize(v) for name, v in turns.samples.items() if name != "all turns"},
+        "tools": {name: summarize(v) for name, v in {**tools.samples, **agent_tools.samples}.items()},
+        "search_calls": search.calls,
+        "market_prices": chat_core.get_market_prices().stats(),
+        "image_cache": chat_core.get_image_cache().stats() if chat_core.get_image_cache() else None,
+        "response_cache": chat_core.get_response_cache().stats(),
+        "outbound": {
+            provider: {event: chat_core.metrics.counter(f"outbound_{event}_total", provider=provider)
+                       for event in ("coalesced", "throttled", "retries", "rejected")}
+            for provider in ("gemini", "tavily")
+        },
+        "search_cache": chat_core.search_cache.stats(),
+        "fast_path": chat_core.get_intent_router().stats()["hit_rate"],
+        "metrics": chat_core.metrics.summary(),
+        "memory": {
+            "import_mb": (after_import_bytes - baseline_bytes) / 1e6,
+            "growth_during_run_mb": (current_bytes - after_import_bytes) / 1e6,
+            "per_session_kb": (current_bytes - after_import_bytes) / 1e3 / max(1, len(sessions)),
+            "peak_mb": peak_bytes / 1e6,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3,
+        },
+    }
+    print(f"\n{turn_count} turns from {total} conversations over {args.sessions} concurrent sessions "
+          f"in {elapsed:.2f} s: {report['throughput_turns_per_s']:.1f} turns/s, {len(errors)} errors")
+    print(f"fast path hit rate {report['fast_path']:.0%}, {search.calls} searches, "
+          f"search cache hit rate {report['search_cache']['hit_rate']:.0%}, "
+          f"response cache hit rate {report['response_cache']['hit_rate']:.0%}")
+    for provider, events in report["outbound"].items():
+        print(f"{provider}: " + ", ".join(f"{count} {event}" for event, count in events.items()))
+    memory = report["memory"]
+    print(f"memory: +{memory['growth_during_run_mb']:.2f} MB during run "
+          f"({memory['per_session_kb']:.1f} KB/session), peak {memory['peak_mb']:.1f} MB traced, "
+          f"max RSS {memory['max_rss_mb']:.0f} MB")
+    for error in errors[:5]:
+        print(f"error: {error}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Compare InventoryIndex against the difflib scan as the stock grows.
+
+    python benchmarks/bench_inventory_index.py [--sizes 20,1000,10000,50000]
+"""
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from inventory_index import InventoryIndex  # noqa: E402
+from inventory_store import InventoryStore  # noqa: E402
+
+MAKES = ["toyota", "honda", "ford", "nissan", "chevrolet", "mercedes-benz", "bmw", "audi",
+         "volkswagen", "hyundai", "kia", "subaru", "lexus", "tesla", "porsche", "jeep",
+         "ram", "mini", "land rover", "volvo", "mazda", "dodge", "gmc", "acura", "infiniti"]
+TRIMS = ["", "sport", "limited", "premium", "touring", "se", "le", "xle", "gt", "platinum"]
+
+
+def load_stock_keys():
+    return list(InventoryStore.from_csv(os.path.join(ROOT, "inventory.csv")))
+
+
+def synthetic_keys(base_keys, size, rng):
+    models = [key.split(" ", 1)[-1] for key in base_keys]
+    keys = set(base_keys)
+    while len(keys) < size:
+        parts = [rng.choice(MAKES), rng.choice(models), rng.choice(TRIMS), str(rng.randint(1995, 2024))]
+        keys.add(" ".join(part for part in parts if part))
+    return list(keys)
+
+
+def typo(text, rng):
+    if len(text) < 3:
+        return text
+    i = rng.randrange(len(text))
+    op = rng.choice(["drop", "swap", "dup"])
+    if op == "drop":
+        return text[:i] + text[i + 1:]
+    if op == "swap" and i < len(text) - 1:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + text[i] + text[i:]
+
+
+def queries_for(base_keys, rng):
+    queries = []
+    for key in base_keys:
+        queries.extend([key, key.upper(), typo(key, rng), typo(typo(key, rng), rng), key.split(" ", 1)[-1]])
+    queries.extend(["spaceship", "cheap suv", "", "toyta corola", "mustang gt"])
+    return queries
+
+
+def difflib_resolve(query, keys):
+    matches = difflib.get_close_matches(query.lower(), keys, n=1, cutoff=0.7)
+    return matches[0] if matches else None
+
+
+# (results, mean seconds per query, p95 seconds per query)
+def timed(fn, queries):
+    results, times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return results, sum(times) / len(times), times[min(len(times) - 1, int(len(times) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="20,1000,10000,50000")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base_keys = load_stock_keys()
+    queries = queries_for(base_keys, rng)
+
+    print(f"{'stock':>8} {'build ms':>10} {'difflib ms/q':>14} {'index ms/q':>12} {'index p95 ms':>13} "
+          f"{'speedup':>9} {'mismatches':>11}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        keys = synthetic_keys(base_keys, size, rng)
+
+        start = time.perf_counter()
+        index = InventoryIndex(keys, cutoff=0.7)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        expected, difflib_s, _ = timed(lambda q: difflib_resolve(q, keys), queries)
+        actual, index_s, index_p95 = timed(index.resolve, queries)
+        mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+        print(f"{size:>8} {build_ms:>10.1f} {difflib_s * 1000:>14.3f} {index_s * 1000:>12.3f} "
+              f"{index_p95 * 1000:>13.3f} {difflib_s / index_s:>8.1f}x {mismatches:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import uuid
+import weakref
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import chat_core
+from chat_core import ChatSession, get_session_store, metrics
+from outbound import OutboundOverloaded
+from session_store import SessionBusy
+from streaming import EventStreamHandler
+
+# HTTP API for the chat pipeline in chat_core, for web and mobile clients:
+#
+#   POST   /chat                 {"message", "session_id"?} -> the reply as JSON
+#   POST   /chat/stream          same body, reply streamed as server-sent events
+#   GET    /sessions/{id}        usage and the newest ?limit= messages (default 50)
+#   DELETE /sessions/{id}
+#   POST   /sessions/{id}/lead   {"name", "email", "whatsapp"}
+#   GET    /healthz, GET /metrics (Prometheus text for this worker)
+#
+# Turns run on Starlette's thread pool, since the agent blocks. Each worker
+# process has its own LLM, caches and metrics; conversations live in the
+# session store (SESSION_STORE=sqlite to share them between workers).
+
+MAX_MESSAGE_CHARS = 4000
+# Comment line sent on an idle event stream so proxies keep it open
+KEEPALIVE_SECONDS = 15
+# How long a request waits for another worker's turn on the same session
+# before giving up with 409
+LEASE_WAIT_SECONDS = 60
+LEASE_POLL_SECONDS = 0.05
+
+# One lock per conversation in this worker, so its turns run one at a time
+_session_locks = weakref.WeakValueDictionary()
+
+
+def _session_lock(session_id):
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
+
+
+# Exclusive use of a session: this worker's lock, then the store's lease so
+# workers sharing a SQLite store take turns too. Yields the lease owner to
+# pass to store.save().
+@contextlib.asynccontextmanager
+async def _session_lease(session_id):
+    store = get_session_store()
+    owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    async with _session_lock(session_id):
+        deadline = asyncio.get_running_loop().time() + LEASE_WAIT_SECONDS
+        while not await run_in_threadpool(store.acquire, session_id, owner):
+            if asyncio.get_running_loop().time() > deadline:
+                raise SessionBusy(f"session {session_id} is busy with another request")
+            await asyncio.sleep(LEASE_POLL_SECONDS)
+        try:
+            yield owner
+        finally:
+            await run_in_threadpool(store.release, session_id, owner)
+
+
+# Offline backends for local testing: python chat_api.py --fake, or CHAT_API_FAKE=1
+def use_fake_backends():
+    from fake_backends import FakeChatModel, FakeSearchClient
+    llm = FakeChatModel(latency=float(os.environ.get("FAKE_LLM_LATENCY", 0.3)),
+                        token_latency=float(os.environ.get("FAKE_TOKEN_LATENCY", 0.02)),
+                        models=list(chat_core.used_car_stock))
+    search = FakeSearchClient(latency=float(os.environ.get("FAKE_SEARCH_LATENCY", 0.4)))
+    chat_core.configure(llm=llm, search_client=search)
+    print(f"[api] worker {os.getpid()} using fake LLM and search backends")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if os.environ.get("CHAT_API_FAKE"):
+        use_fake_backends()
+    elif not chat_core.GOOGLE_API_KEY or not chat_core.TAVILY_API_KEY:
+        raise RuntimeError("GOOGLE_API_KEY and TAVILY_API_KEY are required (or start with --fake)")
+    # Start the market-price refresh and open the session store before the first request
+    await run_in_threadpool(chat_core.get_market_prices)
+    await run_in_threadpool(get_session_store)
+    yield
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(400, "request body must be a JSON object")
+    return body
+
+
+async def _load_session(session_id):
+    session = await run_in_threadpool(get_session_store().load, session_id)
+    if session is None:
+        raise HTTPException(404, f"unknown session {session_id}")
+    return session
+
+
+# (session id, message, is new) from a chat request; unknown session ids are a 404
+async def _read_turn(request):
+    body = await _json_body(request)
+    message = str(body.get("message") or "").strip()
+    if not message:
+        raise HTTPException(400, "message is required")
+    if len(message) > MAX_MESSAGE_CHARS:
+        raise HTTPException(413, f"message is longer than {MAX_MESSAGE_CHARS} characters")
+    session_id = body.get("session_id")
+    if session_id:
+        session_id = str(session_id)
+        if not await run_in_threadpool(get_session_store().exists, session_id):
+            raise HTTPException(404, f"unknown session {session_id}")
+        return session_id, message, False
+    return uuid.uuid4().hex[:12], message, True
+
+
+# Runs one turn and stores the session. The session is loaded under its lease
+# so a second request for the same conversation sees the first one's reply.
+async def take_turn(session_id, message, is_new, callbacks=()):
+    store = get_session_store()
+    async with _session_lease(session_id) as owner:
+        session = ChatSession(session_id) if is_new else await _load_session(session_id)
+        results, turn_metrics = await run_in_threadpool(session.respond, message, list(callbacks))
+        lead_form = session.lead_requested(message)
+        await run_in_threadpool(store.save, session, owner)
+    if isinstance(results, dict):
+        reply, images = results["details"], results.get("images", [])
+    else:
+        reply, images = str(results), []
+    return {"session_id": session_id, "reply": reply, "images": images, "route": turn_metrics["route"],
+            "lead_form": lead_form, "metrics": turn_metrics}
+
+
+def _turn_error(e):
+    if isinstance(e, OutboundOverloaded):
+        return 503, {"error": "We're getting a lot of questions right now. Please try again in a moment."}
+    if isinstance(e, SessionBusy):
+        return 409, {"error": "This conversation is still answering another message. Please try again."}
+    print(f"[api] turn failed: {e!r}")
+    return 500, {"error": f"An error occurred: {e}"}
+
+
+async def chat(request):
+    session_id, message, is_new = await _read_turn(request)
+    try:
+        return JSONResponse(await take_turn(session_id, message, is_new))
+    except Exception as e:
+        status, body = _turn_error(e)
+        return JSONResponse(body, status_code=status, headers={"Retry-After": "5"} if status in (409, 503) else None)
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# Server-sent events: "session" first, then "status" (tool progress) and
+# "token" (answer text deltas; "reset" drops the text streamed so far), and
+# finally "done" with the same payload as POST /chat, or "error".
+async def chat_stream(request):
+    session_id, message, is_new = await _read_turn(request)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(name, data):
+        loop.call_soon_threadsafe(events.put_nowait, (name, data))
+
+    async def stream():
+        yield _event("session", {"session_id": session_id})
+        # The turn finishes and is saved even if the client goes away
+        turn = asyncio.ensure_future(take_turn(session_id, message, is_new, [EventStreamHandler(emit)]))
+        turn.add_done_callback(lambda _: events.put_nowait(None))
+        while True:
+            try:
+                item = await asyncio.wait_for(events.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield _event(*item)
+        try:
+            yield _event("done", turn.result())
+        except Exception as e:
+            yield _event("error", _turn_error(e)[1])
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def get_session(request):
+    try:
+        limit = int(request.query_params.get("limit", 50))
+    except ValueError:
+        raise HTTPException(400, "limit must be an integer")
+    session = await _load_session(request.path_params["session_id"])
+    history = await run_in_threadpool(session.history, max(0, limit))
+    return JSONResponse({"session_id": session.session_id, "usage": session.usage,
+                         "lead_submitted": session.lead_submitted, "messages": len(session.transcript),
+                         "history": history})
+
+
+async def delete_session(request):
+    session_id = request.path_params["session_id"]
+    async with _session_lease(session_id):
+        session = await _load_session(session_id)
+        await run_in_threadpool(session.transcript.discard)
+        await run_in_threadpool(get_session_store().delete, session_id)
+    return Response(status_code=204)
+
+
+async def submit_lead(request):
+    session_id = request.path_params["session_id"]
+    body = await _json_body(request)
+    async with _session_lease(session_id) as owner:
+        session = await _load_session(session_id)
+        try:
+            accepted = session.submit_lead(*(str(body.get(key) or "").strip() for key in ("name", "email", "whatsapp")))
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if not accepted:
+            return JSONResponse({"error": "We're receiving a lot of requests right now. Please try again in a moment."},
+                                status_code=503, headers={"Retry-After": "5"})
+        await run_in_threadpool(get_session_store().save, session, owner)
+    return JSONResponse({"status": "received"}, status_code=202)
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok", "pid": os.getpid(), "session_store": chat_core.SESSION_STORE})
+
+
+async def prometheus(request):
+    return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def http_error(request, exc):
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+
+
+async def session_busy(request, exc):
+    status, body = _turn_error(exc)
+    return JSONResponse(body, status_code=status, headers={"Retry-After": "5"})
+
+
+app = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/chat/stream", chat_stream, methods=["POST"]),
+        Route("/sessions/{session_id}", get_session, methods=["GET"]),
+        Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+        Route("/sessions/{session_id}/lead", submit_lead, methods=["POST"]),
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/metrics", prometheus, methods=["GET"]),
+    ],
+    exception_handlers={HTTPException: http_error, SessionBusy: session_busy},
+    lifespan=lifespan,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the car sales chatbot over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (needs SESSION_STORE=sqlite)")
+    parser.add_argument("--fake", action="store_true", help="use the offline fake LLM and search backends")
+    parser.add_argument("--llm-latency", type=float, help="seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, help="seconds per fake search")
+    args = parser.parse_args()
+    if args.workers > 1 and chat_core.SESSION_STORE != "sqlite":
+        parser.error("--workers > 1 needs SESSION_STORE=sqlite so every worker sees every session")
+
+    # Workers are separate processes and read these from the environment
+    if args.fake:
+        os.environ["CHAT_API_FAKE"] = "1"
+    if args.llm_latency is not None:
+        os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    if args.search_latency is not None:
+        os.environ["FAKE_SEARCH_LATENCY"] = str(args.search_latency)
+
+    import uvicorn
+    uvicorn.run("chat_api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
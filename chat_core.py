@@ -0,0 +1,712 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from search_cache import SearchCache, make_cache_key
+from inventory_index import InventoryIndex
+from inventory_store import InventoryStore, parse_inventory_query
+from metrics import MetricsRegistry, TraceWriter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure API Keys using os.environ
+GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY")
+
+# Stream final-answer tokens into the chat as they arrive (set to 0 for blocking mode)
+STREAM_RESPONSES = os.environ.get("STREAM_RESPONSES", "1") != "0"
+
+# Run tools asynchronously with per-search deadlines (set to 0 for the sync tools)
+ASYNC_TOOLS = os.environ.get("ASYNC_TOOLS", "1") != "0"
+SEARCH_TIMEOUT = float(os.environ.get("SEARCH_TIMEOUT", 8))
+
+# Answer stock-only questions (list, details, price) without the agent
+FAST_PATH = os.environ.get("FAST_PATH", "1") != "0"
+
+# Where leads are stored: "csv" (leads.csv) or "sqlite" (leads.db, imports leads.csv once)
+LEADS_BACKEND = os.environ.get("LEADS_BACKEND", "csv").lower()
+LEADS_CSV = os.environ.get("LEADS_CSV", "leads.csv")
+
+# Where the HTTP API keeps conversations: "memory" (one worker process only) or
+# "sqlite" (SESSION_DB, shared by every worker); idle sessions expire after SESSION_TTL seconds
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory").lower()
+SESSION_DB = os.environ.get("SESSION_DB", "sessions.db")
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 86400))
+
+# Transcripts: a session keeps its newest TRANSCRIPT_MEMORY_KB of messages in
+# memory and appends older ones to a file in TRANSCRIPT_DIR; the chat renders
+# HISTORY_PAGE_SIZE messages at a time
+TRANSCRIPT_DIR = os.environ.get("TRANSCRIPT_DIR", os.path.join(BASE_DIR, ".transcripts"))
+TRANSCRIPT_MEMORY_KB = float(os.environ.get("TRANSCRIPT_MEMORY_KB", 256))
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", 20))
+
+# Conversation memory: recent turns plus a running summary, capped at this many
+# tokens (0 keeps the full, unbounded history)
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", 1500))
+MEMORY_WINDOW_TURNS = int(os.environ.get("MEMORY_WINDOW_TURNS", 6))
+
+# Market price snapshots: background refresh interval (0 turns snapshots off)
+# and the age after which a snapshot is too stale to quote
+MARKET_REFRESH_SECONDS = float(os.environ.get("MARKET_REFRESH_SECONDS", 21600))
+MARKET_MAX_AGE = float(os.environ.get("MARKET_MAX_AGE", 43200))
+
+# Outbound limits shared by every session in the process: calls per second and
+# burst for each provider, how many callers may wait for a slot and for how
+# long, and retries for rate-limited or failed calls (OUTBOUND_LIMITS=0 calls
+# the providers directly)
+OUTBOUND_LIMITS = os.environ.get("OUTBOUND_LIMITS", "1") != "0"
+GEMINI_RATE = float(os.environ.get("GEMINI_RATE", 10))
+GEMINI_BURST = int(os.environ.get("GEMINI_BURST", 20))
+TAVILY_RATE = float(os.environ.get("TAVILY_RATE", 5))
+TAVILY_BURST = int(os.environ.get("TAVILY_BURST", 10))
+OUTBOUND_MAX_QUEUE = int(os.environ.get("OUTBOUND_MAX_QUEUE", 100))
+OUTBOUND_MAX_WAIT = float(os.environ.get("OUTBOUND_MAX_WAIT", 30))
+OUTBOUND_RETRIES = int(os.environ.get("OUTBOUND_RETRIES", 3))
+
+# Car photos: the top IMAGES_PER_CAR search images become thumbnails in an
+# on-disk LRU cache of IMAGE_CACHE_MB (0 turns it off), prefetched for the
+# whole stock at startup. A render waits IMAGE_WAIT seconds for missing ones
+# before falling back to the original URLs.
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(BASE_DIR, ".image_cache"))
+IMAGE_CACHE_MB = float(os.environ.get("IMAGE_CACHE_MB", 200))
+IMAGES_PER_CAR = int(os.environ.get("IMAGES_PER_CAR", 4))
+IMAGE_PREFETCH = os.environ.get("IMAGE_PREFETCH", "1") != "0"
+IMAGE_WAIT = float(os.environ.get("IMAGE_WAIT", 3))
+
+# Agent answers to context-independent prompts are reused for near-identical
+# prompts until the stock or the relevant market prices change (0 turns it off)
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 512))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 3600))
+
+# Print the agent's ReAct trace to stdout
+AGENT_VERBOSE = os.environ.get("AGENT_VERBOSE", "1") != "0"
+
+# Metrics export: Prometheus text rewritten after every turn, and one JSON line
+# per turn with its LLM calls, tool runs and token counts (both off when unset)
+METRICS_TEXTFILE = os.environ.get("METRICS_TEXTFILE") or None
+METRICS_TRACE_FILE = os.environ.get("METRICS_TRACE_FILE") or None
+
+
+# Builds a shared object once per process, on first use, for every session
+# (and every Streamlit rerun) in it.
+def process_resource(factory):
+    lock = threading.Lock()
+    built = []
+
+    @functools.wraps(factory)
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+    get.reset = built.clear
+    return get
+
+# Backends set with configure() replace Gemini and Tavily, e.g. the fakes in
+# fake_backends.py for offline benchmarks and tests.
+_backends = {}
+
+def configure(llm=None, search_client=None, image_fetch=None):
+    if llm is not None:
+        _backends["llm"] = llm
+        _managed_llm.reset()
+    if search_client is not None:
+        _backends["search_client"] = search_client
+    if image_fetch is not None:
+        _backends["image_fetch"] = image_fetch
+
+# Expensive clients are built once per process and shared by every session and
+# rerun. Their imports are deferred until first use to keep cold starts short.
+
+# Initialize Gemini 2.0 Flash LLM
+@process_resource
+def _gemini_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    # With outbound limits on, retries happen in the outbound client instead
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.7,
+                                  max_retries=1 if OUTBOUND_LIMITS else 6)
+
+@process_resource
+def _managed_llm():
+    from managed_llm import ManagedChatModel
+    return ManagedChatModel(inner=_backends.get("llm") or _gemini_llm(), client=get_outbound_clients()["gemini"])
+
+def get_llm():
+    if OUTBOUND_LIMITS:
+        return _managed_llm()
+    return _backends.get("llm") or _gemini_llm()
+
+# Tavily Client
+@process_resource
+def _tavily_client():
+    from tavily import TavilyClient
+    return TavilyClient(TAVILY_API_KEY)
+
+def get_tavily_client():
+    return _backends.get("search_client") or _tavily_client()
+
+# Rate limits, request coalescing, backpressure and retries for outbound calls
+@process_resource
+def get_outbound_clients():
+    from outbound import OutboundClient
+    shared = dict(max_queue=OUTBOUND_MAX_QUEUE, max_wait=OUTBOUND_MAX_WAIT, retries=OUTBOUND_RETRIES,
+                  registry=get_metrics())
+    return {
+        "gemini": OutboundClient("gemini", GEMINI_RATE, GEMINI_BURST, **shared),
+        "tavily": OutboundClient("tavily", TAVILY_RATE, TAVILY_BURST,
+                                 max_concurrent=int(os.environ.get("SEARCH_WORKERS", 8)), **shared),
+    }
+
+# Used Car Stock, loaded once per process into a columnar store (optionally memory-mapped)
+@process_resource
+def get_inventory_store():
+    return InventoryStore.load(
+        os.environ.get("INVENTORY_PATH", os.path.join(BASE_DIR, "inventory.csv")),
+        mmap_dir=os.environ.get("INVENTORY_MMAP_DIR") or None,
+    )
+
+used_car_stock = get_inventory_store()
+
+# Fuzzy model-name index, built once per process from the stock
+@process_resource
+def get_inventory_index():
+    return InventoryIndex(used_car_stock.keys(), cutoff=0.7)
+
+inventory_index = get_inventory_index()
+
+def resolve_car_model(car_model):
+    car_model_lower = car_model.lower()
+    match = inventory_index.resolve(car_model_lower)
+    return match if match else car_model_lower
+
+# Search Cache shared by every session in this process (optionally persisted to SQLite)
+@process_resource
+def get_search_cache():
+    return SearchCache(
+        max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", 256)),
+        ttl=float(os.environ.get("SEARCH_CACHE_TTL", 3600)),
+        db_path=os.environ.get("SEARCH_CACHE_DB") or None,
+    )
+
+search_cache = get_search_cache()
+
+# Latency histograms and counters for turns, LLM calls, tools and searches
+@process_resource
+def get_metrics():
+    return MetricsRegistry()
+
+metrics = get_metrics()
+
+@process_resource
+def get_trace_writer():
+    return TraceWriter(METRICS_TRACE_FILE) if METRICS_TRACE_FILE else None
+
+# Tavily Search Tool. Background searches (market refresh, image prefetch)
+# only use Tavily capacity that interactive tool calls leave over.
+def tavily_search_with_images(query, include_images=True, background=False):
+    started = time.perf_counter()
+    cached = search_cache.get(query, include_images)
+    if cached is not None:
+        metrics.observe("search_seconds", time.perf_counter() - started, source="cache")
+        return cached
+    try:
+        if OUTBOUND_LIMITS:
+            # Sessions searching for the same thing at the same time share one call
+            response = get_outbound_clients()["tavily"].call(
+                get_tavily_client().search, query=query, include_images=include_images,
+                key=make_cache_key(query, include_images), background=background,
+            )
+        else:
+            response = get_tavily_client().search(query=query, include_images=include_images)
+    except Exception as e:
+        metrics.inc("search_errors_total", source="tavily")
+        return f"Error during Tavily search: {e}"
+    finally:
+        metrics.observe("search_seconds", time.perf_counter() - started, source="tavily")
+    search_cache.set(query, include_images, response)
+    return response
+
+# Price Comparison (Enhanced) with fuzzy matching and discount factor
+def price_search_query(car_model):
+    return f"{car_model} used car price comparison"
+
+# Market prices for every model in stock, refreshed in the background. Price
+# questions are answered from the latest snapshot; only models without a
+# fresh one fall back to a live search.
+@process_resource
+def get_market_prices():
+    from market_prices import MarketPriceEngine
+    engine = MarketPriceEngine(
+        lambda: used_car_stock,
+        lambda query: tavily_search_with_images(query, include_images=False, background=True),
+        price_search_query,
+        refresh_interval=MARKET_REFRESH_SECONDS,
+        # Without the refresh every comparison searches live
+        max_age=MARKET_MAX_AGE if MARKET_REFRESH_SECONDS > 0 else 0,
+    )
+    if MARKET_REFRESH_SECONDS > 0:
+        engine.start()
+    return engine
+
+def compare_prices(car_model):
+    car_model_lower = resolve_car_model(car_model)
+    snapshot = get_market_prices().latest(car_model_lower)
+    if snapshot is None:
+        results = tavily_search_with_images(price_search_query(car_model), include_images=False)
+        snapshot = get_market_prices().ingest(car_model_lower, results)
+    return format_price_comparison(car_model, snapshot)
+
+# snapshot is None when the search failed, or timed out (async tools)
+def format_price_comparison(car_model, snapshot, timed_out=False):
+    car_model_lower = resolve_car_model(car_model)
+    if snapshot is not None:
+        search_url = snapshot['url'] or "No search URL found."
+
+        if car_model_lower in used_car_stock:
+            original_price = used_car_stock[car_model_lower]["price"]
+            discount_factor = 0.90
+            our_price = int(original_price * discount_factor)
+            our_interior = used_car_stock[car_model_lower]["interior"]
+
+            if snapshot['samples']:
+                median_online_price = snapshot['median']
+                price_difference = our_price - median_online_price
+                listings = f"{snapshot['samples']} online listing{'s' if snapshot['samples'] != 1 else ''}"
+
+                if price_difference < 0:
+                    comparison_message = (f"Our {car_model.capitalize()} is priced at ${our_price:,}, "
+                                          f"which is ${abs(price_difference):,.0f} less than the median price of {listings}. ")
+                elif price_difference > 0:
+                    comparison_message = (f"Our {car_model.capitalize()} is priced at ${our_price:,}. "
+                                          f"While {listings} have a median price of ${median_online_price:,.0f}, we offer added value through our dealership's benefits. ")
+                else:
+                    comparison_message = (f"Our {car_model.capitalize()} is competitively priced at ${our_price:,}, "
+                                          f"matching the median online price. ")
+
+                return (f"{comparison_message}It features {our_interior}. Check online prices here: "
+                        f"[{search_url}]({search_url}). We also offer [mention dealership benefits here].")
+            else:
+                return (f"Our {car_model.capitalize()} is priced at ${our_price:,} and features {our_interior}. "
+                        "We couldn't find comparable online prices, but we offer [mention dealership benefits here].")
+        else:
+            return (f"Other dealers are selling the {car_model.capitalize()} at these prices: {snapshot['excerpt']} "
+                    f"Check it out here: [{search_url}]({search_url}).")
+    elif timed_out and car_model_lower in used_car_stock:
+        # The online price search missed its deadline; answer with what we know
+        our_price = int(used_car_stock[car_model_lower]["price"] * 0.90)
+        our_interior = used_car_stock[car_model_lower]["interior"]
+        return (f"Our {car_model.capitalize()} is priced at ${our_price:,} and features {our_interior}. "
+                "Online prices are taking too long to load right now, but we offer [mention dealership benefits here].")
+    else:
+        return "Could not retrieve competitor price information at this time."
+
+# Why Buy From Us Tool – compares prices and highlights our benefits
+def why_buy_from_us(car_model):
+    return format_why_buy_from_us(compare_prices(car_model))
+
+def format_why_buy_from_us(comparison):
+    additional_info = (
+        "At our dealership, every vehicle undergoes a rigorous inspection process, ensuring quality and a verified service history, "
+        "plus exclusive perks that you won't find elsewhere. We not only offer competitive pricing but also provide a personalized buying experience."
+    )
+    return f"{comparison} {additional_info}"
+
+# Car Details with Image Retrieval using Columns for a neat layout with fuzzy matching
+def car_details_search_query(car_model):
+    return f"{car_model} used car"
+
+def get_car_details(car_model):
+    car_model_lower = resolve_car_model(car_model)
+    if car_model_lower in used_car_stock:
+        search_results = tavily_search_with_images(car_details_search_query(car_model))
+        return prefetch_car_images(format_car_details(car_model, search_results))
+    return format_car_details(car_model, None)
+
+def format_car_details(car_model, search_results):
+    car_model_lower = resolve_car_model(car_model)
+    if car_model_lower in used_car_stock:
+        details = used_car_stock[car_model_lower]
+        image_urls = top_image_urls(search_results)
+        detail_string = (
+            f"**Absolutely! We have a {car_model.capitalize()} available.** \n\n"
+            f"**Mileage:** {details['mileage']:,} miles  \n"
+            f"**Interior:** {details['interior']}  \n"
+            f"**Details:** {details['details']}  \n"
+            f"**Price:** ${details['price']:,}  \n"
+            f"**Benefits:** {details['benefits']}"
+        )
+        return {"details": detail_string, "images": image_urls}
+    else:
+        return {"details": f"Sorry, the {car_model.capitalize()} is not currently in our stock.", "images": []}
+
+# Tavily lists images as URLs, or as {"url", "description"} with descriptions on
+def top_image_urls(search_results):
+    if not isinstance(search_results, dict) or not search_results.get('images'):
+        return []
+    urls = [image["url"] if isinstance(image, dict) else image for image in search_results['images']]
+    return list(dict.fromkeys(urls))[:IMAGES_PER_CAR]
+
+# Thumbnails of car photos, shared by every session and kept across restarts;
+# None when IMAGE_CACHE_MB is 0
+@process_resource
+def get_image_cache():
+    from image_cache import ImageCache, download
+    if IMAGE_CACHE_MB <= 0:
+        return None
+    cache = ImageCache(IMAGE_CACHE_DIR, max_bytes=int(IMAGE_CACHE_MB * 1024 * 1024),
+                       fetch=_backends.get("image_fetch", download), registry=get_metrics())
+    if IMAGE_PREFETCH:
+        cache.prefetch_in_background(
+            list(used_car_stock),
+            lambda car_model: top_image_urls(
+                tavily_search_with_images(car_details_search_query(car_model), background=True)),
+        )
+    return cache
+
+# Starts the thumbnail downloads as soon as the details are known, so they are
+# ready by the time the answer renders
+def prefetch_car_images(details):
+    if details["images"] and IMAGE_CACHE_MB > 0:
+        get_image_cache().prefetch(details["images"])
+    return details
+
+# Local thumbnails to render for a details answer, or the original URLs if
+# none could be cached in time
+def car_images(image_urls):
+    if not image_urls or IMAGE_CACHE_MB <= 0:
+        return image_urls or []
+    return get_image_cache().fetch_all(image_urls, timeout=IMAGE_WAIT) or image_urls
+
+# Async tool variants: independent searches run concurrently on a shared thread
+# pool, each bounded by SEARCH_TIMEOUT. A search that misses its deadline keeps
+# running in the background (its result still lands in the search cache) while
+# the tool answers with what it has.
+@process_resource
+def get_search_executor():
+    return ThreadPoolExecutor(max_workers=int(os.environ.get("SEARCH_WORKERS", 8)), thread_name_prefix="search")
+
+search_executor = get_search_executor()
+
+def start_search(query, include_images=True):
+    return asyncio.get_running_loop().run_in_executor(search_executor, tavily_search_with_images, query, include_images)
+
+async def await_search(future, timeout=None):
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout or SEARCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"Search timed out after {timeout or SEARCH_TIMEOUT}s")
+        return None
+
+async def acompare_prices(car_model):
+    car_model_lower = resolve_car_model(car_model)
+    snapshot = get_market_prices().latest(car_model_lower)
+    if snapshot is None:
+        results = await await_search(start_search(price_search_query(car_model), include_images=False))
+        if results is None:
+            return format_price_comparison(car_model, None, timed_out=True)
+        snapshot = get_market_prices().ingest(car_model_lower, results)
+    return format_price_comparison(car_model, snapshot)
+
+async def awhy_buy_from_us(car_model):
+    return format_why_buy_from_us(await acompare_prices(car_model))
+
+async def aget_car_details(car_model):
+    if resolve_car_model(car_model) not in used_car_stock:
+        return format_car_details(car_model, None)
+    # Fan out the image search and, if snapshots are on and the model has no
+    # fresh one, a price refresh; only the images are awaited, the snapshot is
+    # ready for a follow-up comparison.
+    image_search = start_search(car_details_search_query(car_model))
+    car_model_lower = resolve_car_model(car_model)
+    if MARKET_REFRESH_SECONDS > 0 and get_market_prices().latest(car_model_lower) is None:
+        search_executor.submit(get_market_prices().refresh_model, car_model_lower)
+    return prefetch_car_images(format_car_details(car_model, await await_search(image_search)))
+
+# List Cars
+def list_available_cars():
+    if not used_car_stock:
+        return "Our stock is currently empty."
+    else:
+        cars = ", ".join(car.capitalize() for car in used_car_stock)
+        return f"We currently have the following used cars in stock: {cars}."
+
+# Price of a car in stock, straight from the inventory
+def get_car_price(car_model):
+    car_model_lower = resolve_car_model(car_model)
+    if car_model_lower in used_car_stock:
+        car = used_car_stock[car_model_lower]
+        return (f"Our {car_model_lower.capitalize()} is priced at ${car['price']:,} "
+                f"with {car['mileage']:,} miles. {car['details']}")
+    return f"Sorry, the {car_model.capitalize()} is not currently in our stock."
+
+# Search Inventory by price, mileage, year and body type
+def search_inventory(query):
+    filters = parse_inventory_query(query)
+    try:
+        cars = used_car_stock.query(**filters)
+    except ValueError as e:
+        return f"Could not search the inventory: {e}"
+    if not cars:
+        return "No cars in our stock match those requirements."
+    matches = "; ".join(
+        f"{car['model'].capitalize()} ({car['year']} {car['body_type']}, ${car['price']:,}, {car['mileage']:,} miles)"
+        for car in cars
+    )
+    return f"These cars in our stock match your requirements: {matches}."
+
+# Lead Sink: submissions are queued and written in batches by a background thread
+@process_resource
+def get_lead_sink():
+    from lead_sink import CsvLeadBackend, LeadSink, SqliteLeadBackend
+    if LEADS_BACKEND == "sqlite":
+        backend = SqliteLeadBackend(os.environ.get("LEADS_DB", "leads.db"), migrate_csv=LEADS_CSV)
+    else:
+        backend = CsvLeadBackend(LEADS_CSV)
+    return LeadSink(backend, max_latency=float(os.environ.get("LEADS_FLUSH_SECONDS", 1.0)),
+                    fallback_path=os.environ.get("LEADS_FALLBACK", "leads.failed.jsonl"))
+
+# Phrases after which the customer is asked for their contact details
+LEAD_KEYWORDS = ("contact me", "whatsapp", "book me", "contact details", "call me", "reach me", "phone")
+
+# LangChain Agent Setup
+@process_resource
+def get_tools():
+    from langchain.tools import Tool
+    tools = [
+        Tool(name="ComparePrices", func=lambda car_model: compare_prices(car_model), coroutine=acompare_prices,
+             description="Compares used car prices with other dealers and provides links and interior details."),
+        Tool(name="GetCarDetails", func=lambda car_model: get_car_details(car_model), coroutine=aget_car_details,
+             description="Retrieves used car details, mileage, interior, and images."),
+        Tool(name="ListAvailableCars", func=lambda _: list_available_cars(),
+             description="Lists all available used cars in stock."),
+        Tool(name="SearchInventory", func=lambda query: search_inventory(query),
+             description="Searches the used car stock by attributes. Input is comma-separated key=value filters: "
+                         "body_type (sedan, suv, coupe, truck, hatchback, wagon), min_price, max_price, max_mileage, "
+                         "min_year, max_year, sort_by (price, mileage, year), descending (true/false), limit. "
+                         "Example: body_type=suv, max_price=25000, max_mileage=50000"),
+        Tool(name="WhyBuyFromUs", func=lambda car_model: why_buy_from_us(car_model), coroutine=awhy_buy_from_us,
+             description="Explains why you should buy from us by comparing prices and highlighting exclusive benefits.")
+    ]
+    for tool in tools:
+        tool.func = metrics.wrap(tool.func, "tool_call", tool=tool.name)
+        if tool.coroutine:
+            tool.coroutine = metrics.wrap(tool.coroutine, "tool_call", tool=tool.name)
+    return tools
+
+# Fast path: prompts answerable from the stock alone skip the agent
+@process_resource
+def get_intent_router():
+    from intent_router import IntentRouter
+    if ASYNC_TOOLS:
+        details = lambda car_model: asyncio.run(aget_car_details(car_model))
+    else:
+        details = get_car_details
+    return IntentRouter(inventory_index, {
+        "list": list_available_cars,
+        "details": details,
+        "price": get_car_price,
+    })
+
+# Response cache in front of the agent. Entries are keyed by the inventory
+# version and the market snapshot versions of the models in the prompt.
+def _response_version(models):
+    market = get_market_prices()
+    snapshots = (market.latest(model) for model in models)
+    return used_car_stock.version, tuple(snapshot["version"] if snapshot else None for snapshot in snapshots)
+
+@process_resource
+def get_response_cache():
+    from response_cache import ResponseCache
+    return ResponseCache(get_intent_router().find_models, _response_version,
+                         max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+# Conversation store for the HTTP API (chat_api.py)
+@process_resource
+def get_session_store():
+    from session_store import MemorySessionStore, SqliteSessionStore
+    if SESSION_STORE == "sqlite":
+        return SqliteSessionStore(SESSION_DB, ChatSession.from_state, ttl=SESSION_TTL)
+    return MemorySessionStore(ttl=SESSION_TTL)
+
+# Spill directory for long transcripts; files of sessions idle for SESSION_TTL
+# are removed when the process starts
+@process_resource
+def get_transcript_dir():
+    from transcript import remove_stale_spill_files
+    os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+    removed = remove_stale_spill_files(TRANSCRIPT_DIR, SESSION_TTL)
+    if removed:
+        print(f"[transcripts] removed {removed} stale spill files")
+    return TRANSCRIPT_DIR
+
+# Conversation memory over the session's transcript: the token-budgeted
+# summary window, or the full history
+def build_memory(transcript):
+    from transcript import TranscriptHistory
+    if MEMORY_TOKEN_BUDGET > 0:
+        from conversation_memory import BudgetedConversationMemory
+        return BudgetedConversationMemory(
+            llm=get_llm(), chat_memory=TranscriptHistory(transcript), memory_key="chat_history",
+            return_messages=True, max_token_limit=MEMORY_TOKEN_BUDGET, window_turns=MEMORY_WINDOW_TURNS,
+        )
+    from langchain.memory import ConversationBufferMemory
+    return ConversationBufferMemory(chat_memory=TranscriptHistory(transcript), memory_key="chat_history",
+                                    return_messages=True)
+
+
+# One conversation. The LLM, tools and caches are shared by the whole process;
+# a session owns its transcript, and the memory and agent built over it on the
+# first turn.
+class ChatSession:
+    def __init__(self, session_id=None, transcript=None):
+        from transcript import Transcript
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.usage = {"turns": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.lead_submitted = False
+        self.transcript = transcript or Transcript(self.session_id, get_transcript_dir(),
+                                                   int(TRANSCRIPT_MEMORY_KB * 1024))
+        self._memory = None
+        self._agent = None
+
+    # JSON-serializable state for session stores shared between processes; the
+    # agent is rebuilt around the restored memory on the next turn. Spilled
+    # messages stay in their file.
+    def to_state(self):
+        state = {"session_id": self.session_id, "usage": dict(self.usage), "lead_submitted": self.lead_submitted,
+                 "summary": "", "window_start": 0, "transcript": self.transcript.to_state()}
+        if self._memory is not None:
+            state["summary"] = getattr(self._memory, "moving_summary_buffer", "")
+            state["window_start"] = self._memory.chat_memory.start
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        from transcript import Transcript
+        transcript = Transcript.from_state(state["session_id"], state["transcript"], get_transcript_dir(),
+                                           int(TRANSCRIPT_MEMORY_KB * 1024))
+        session = cls(state["session_id"], transcript)
+        session.usage.update(state["usage"])
+        session.lead_submitted = state["lead_submitted"]
+        if len(transcript) or state["summary"]:
+            session.memory.chat_memory.start = state["window_start"]
+            if hasattr(session.memory, "moving_summary_buffer"):
+                session.memory.moving_summary_buffer = state["summary"]
+        return session
+
+    # The newest `limit` transcript entries, oldest first
+    def history(self, limit=50):
+        return self.transcript.tail(limit)
+
+    # Records a turn that failed before reaching memory, for the chat UI only
+    def record_failed_turn(self, prompt, reply):
+        self.transcript.append("user", prompt, memory=False)
+        self.transcript.append("assistant", reply, memory=False)
+
+    # True when the prompt asks to be contacted and no lead was taken yet
+    def lead_requested(self, prompt):
+        text = prompt.lower()
+        return not self.lead_submitted and any(keyword in text for keyword in LEAD_KEYWORDS)
+
+    # Queues the customer's details; False when the lead sink is saturated
+    def submit_lead(self, name, email, whatsapp):
+        if not (name and email and whatsapp):
+            raise ValueError("name, email and whatsapp are all required")
+        if not get_lead_sink().submit({"name": name, "email": email, "whatsapp": whatsapp}):
+            return False
+        self.lead_submitted = True
+        return True
+
+    @property
+    def memory(self):
+        if self._memory is None:
+            self._memory = build_memory(self.transcript)
+        return self._memory
+
+    @property
+    def agent(self):
+        if self._agent is None:
+            from langchain.agents import initialize_agent, AgentType
+            self._agent = initialize_agent(
+                get_tools(), get_llm(), agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
+                verbose=AGENT_VERBOSE, memory=self.memory,
+            )
+        return self._agent
+
+    # Returns the reply (a string, or the {"details", "images"} dict from
+    # GetCarDetails) and the turn's metrics. Callbacks only reach the agent.
+    def respond(self, prompt, callbacks=()):
+        from conversation_memory import PromptSizeTracker
+        from instrumentation import InstrumentationHandler
+        started = time.perf_counter()
+        turn_metrics = {}
+        instrumentation = InstrumentationHandler(metrics)
+        route = "agent"
+        try:
+            routed = get_intent_router().route(prompt) if FAST_PATH else None
+            if routed is None and RESPONSE_CACHE_SIZE > 0:
+                cache_started = time.perf_counter()
+                cached = get_response_cache().get(prompt)
+                if cached is not None:
+                    routed = "cache", cached
+                    get_intent_router().record("cache", (time.perf_counter() - cache_started) * 1000)
+            if routed:
+                route, results = routed
+                answer = results["details"] if isinstance(results, dict) else results
+                self.memory.save_context({"input": prompt}, {"output": answer})
+            else:
+                # Only answers given with no earlier turns or summary can be replayed to other sessions
+                cacheable = RESPONSE_CACHE_SIZE > 0 and not self.memory.chat_memory.messages and not getattr(
+                    self.memory, "moving_summary_buffer", "")
+                prompt_tracker = PromptSizeTracker()
+                callbacks = [prompt_tracker, instrumentation, *callbacks]
+                if ASYNC_TOOLS:
+                    results = asyncio.run(self.agent.arun(prompt, callbacks=callbacks))
+                else:
+                    results = self.agent.run(prompt, callbacks=callbacks)
+                turn_metrics.update(prompt_tracker.stats())
+                turn_metrics["history_tokens"] = getattr(self.memory, "last_history_tokens", None)
+                if cacheable:
+                    get_response_cache().put(prompt, results)
+        except Exception as e:
+            metrics.inc("chat_turn_errors_total", route=route)
+            self._record_turn(prompt, route, (time.perf_counter() - started) * 1000, instrumentation, error=str(e))
+            raise
+        turn_metrics["route"] = route
+        turn_metrics["turn_ms"] = (time.perf_counter() - started) * 1000
+        if route == "agent":
+            get_intent_router().record("agent", turn_metrics["turn_ms"])
+            turn_metrics.update(instrumentation.stats())
+        # Memory wrote the reply text to the transcript; images are kept by URL
+        if isinstance(results, dict):
+            self.transcript.update_last(images=list(results.get("images", ())), metrics=turn_metrics)
+        else:
+            self.transcript.update_last(metrics=turn_metrics)
+        self._record_turn(prompt, route, turn_metrics["turn_ms"], instrumentation)
+        return results, turn_metrics
+
+    # Session token totals, the turn histogram, and the optional exports
+    def _record_turn(self, prompt, route, turn_ms, instrumentation, error=None):
+        turn = instrumentation.stats()
+        self.usage["turns"] += 1
+        for key in ("llm_calls", "prompt_tokens", "completion_tokens"):
+            self.usage[key] += turn[key]
+        metrics.observe("chat_turn_seconds", turn_ms / 1000, route=route)
+        trace = get_trace_writer()
+        if trace:
+            event = {"session": self.session_id, "turn": self.usage["turns"], "route": route,
+                     "turn_ms": turn_ms, "prompt_chars": len(prompt), **turn, "spans": instrumentation.spans}
+            if error:
+                event["error"] = error
+            trace.write(event)
+        if METRICS_TEXTFILE:
+            metrics.write_prometheus(METRICS_TEXTFILE)
@@ -0,0 +1,122 @@
+import math
+import re
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import get_buffer_string
+
+_MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\((https?://[^)\s]+)\)")
+_BARE_URL = re.compile(r"https?://\S+")
+_BOLD = re.compile(r"\*\*|__")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Rough token count (~4 characters per token). Gemini's own counter is a
+# network call, far too slow to run on every turn.
+def estimate_tokens(text):
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def estimate_message_tokens(messages):
+    return estimate_tokens(get_buffer_string(messages))
+
+
+# Shrinks text before it is stored: markdown links keep only their label, bare
+# URLs and bold markers are dropped, whitespace is collapsed, and anything past
+# max_chars is cut at the last sentence boundary.
+def compact_text(text, max_chars):
+    text = _MARKDOWN_LINK.sub(r"\1", str(text))
+    text = _BARE_URL.sub("", text)
+    text = _BOLD.sub("", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_end = cut.rfind(". ")
+    if sentence_end > max_chars // 2:
+        cut = cut[:sentence_end + 1]
+    return cut.rstrip() + " …"
+
+
+# Sliding window of recent turns plus a running summary of older ones, kept
+# under max_token_limit. Whenever the window overflows (too many turns or too
+# many tokens), the oldest messages are folded into the summary with one LLM
+# call, so the history replayed into each prompt stays roughly constant.
+class BudgetedConversationMemory(ConversationSummaryBufferMemory):
+    window_turns: int = 6
+    max_message_chars: int = 600
+    last_history_tokens: int = 0
+
+    @property
+    def max_summary_chars(self):
+        return self.max_token_limit // 3 * 4
+
+    # Messages are stored in full (the chat UI shows them) and compacted as
+    # they are read into the prompt
+    def _window(self):
+        return [message.model_copy(update={"content": compact_text(message.content, self.max_message_chars)})
+                for message in self.chat_memory.messages]
+
+    def load_memory_variables(self, inputs):
+        buffer = self._window()
+        if self.moving_summary_buffer:
+            buffer = [self.summary_message_cls(content=self.moving_summary_buffer)] + buffer
+        self.last_history_tokens = estimate_message_tokens(buffer)
+        if self.return_messages:
+            return {self.memory_key: buffer}
+        return {self.memory_key: get_buffer_string(buffer, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)}
+
+    async def aload_memory_variables(self, inputs):
+        return self.load_memory_variables(inputs)
+
+    # Transcript-backed histories move their window; plain ones lose the messages
+    def _drop_oldest(self, count):
+        if hasattr(self.chat_memory, "drop_oldest"):
+            self.chat_memory.drop_oldest(count)
+        else:
+            del self.chat_memory.messages[:count]
+
+    def _pop_overflow(self):
+        # Always keep the latest exchange out of the summary
+        buffer = self._window()
+        budget = self.max_token_limit - estimate_tokens(self.moving_summary_buffer)
+        pruned = []
+        while len(buffer) > 2 and (len(buffer) > 2 * self.window_turns
+                                   or estimate_message_tokens(buffer) > budget):
+            pruned.append(buffer.pop(0))
+        if pruned:
+            self._drop_oldest(len(pruned))
+        return pruned
+
+    def prune(self):
+        pruned = self._pop_overflow()
+        if pruned:
+            summary = self.predict_new_summary(pruned, self.moving_summary_buffer)
+            self.moving_summary_buffer = compact_text(summary, self.max_summary_chars)
+
+    async def aprune(self):
+        pruned = self._pop_overflow()
+        if pruned:
+            summary = await self.apredict_new_summary(pruned, self.moving_summary_buffer)
+            self.moving_summary_buffer = compact_text(summary, self.max_summary_chars)
+
+
+# Records the estimated size of every prompt sent to the LLM during a turn
+class PromptSizeTracker(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self):
+        self.prompt_tokens = []
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.prompt_tokens.append(sum(estimate_tokens(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.prompt_tokens.append(sum(estimate_message_tokens(batch) for batch in messages))
+
+    def stats(self):
+        return {
+            "llm_calls": len(self.prompt_tokens),
+            "prompt_tokens": sum(self.prompt_tokens),
+            "max_prompt_tokens": max(self.prompt_tokens, default=0),
+        }
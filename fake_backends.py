@@ -0,0 +1,143 @@
+import hashlib
+import io
+import math
+import random
+import re
+import threading
+import time
+from typing import List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Offline stand-ins for Gemini, Tavily and image downloads with configurable
+# latency and canned answers, for benchmarks and local testing. Install them with
+# chat_core.configure(llm=FakeChatModel(...), search_client=FakeSearchClient(...),
+# image_fetch=FakeImageFetcher(...)).
+
+
+def _estimate_tokens(text):
+    return max(1, math.ceil(len(text) / 4))
+
+
+# Canned Tavily responses. Each query always gets the same listings and prices,
+# so runs are repeatable; latency, jitter and failures are configurable.
+class FakeSearchClient:
+    def __init__(self, latency=0.3, jitter=0.0, failure_rate=0.0, images=3, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.images = images
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def search(self, query, include_images=True, **kwargs):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("fake search failure (HTTP 429)")
+        query_rng = random.Random(query.lower())
+        base = query_rng.randrange(15000, 60000, 500)
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")
+        content = (f"Used listings for {query}: ${base:,}, ${base + 1500:,} and ${base - 900:,} "
+                   f"depending on mileage and trim.")
+        return {
+            "query": query,
+            "results": [{"title": f"{query} listings", "url": f"https://example.com/listings/{slug}",
+                         "content": content, "score": 0.9}],
+            "images": [f"https://example.com/images/{slug}-{i}.jpg" for i in range(self.images)] if include_images else [],
+        }
+
+
+# Serves a full-size JPEG per URL, in a solid colour derived from the URL, after
+# `latency` seconds. Needs Pillow.
+class FakeImageFetcher:
+    def __init__(self, latency=0.2, size=(1600, 1067)):
+        self.latency = latency
+        self.size = size
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, url, timeout=None):
+        from PIL import Image
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        colour = tuple(hashlib.sha256(url.encode()).digest()[:3])
+        out = io.BytesIO()
+        Image.new("RGB", self.size, colour).save(out, format="JPEG", quality=95)
+        return out.getvalue(), "image/jpeg"
+
+
+# Scripted ReAct replies for the conversational agent: picks a tool from
+# keywords in the newest input, then answers from the tool's observation.
+# Each call sleeps `latency` before the first token and `token_latency`
+# between streamed tokens.
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.5
+    token_latency: float = 0.0
+    models: List[str] = []
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _find_model(self, text):
+        for model in self.models:
+            if model in text:
+                return model
+        for model in self.models:
+            if any(len(word) > 2 and re.search(rf"\b{re.escape(word)}\b", text) for word in model.split()[1:]):
+                return model
+        return "honda vezel"
+
+    def _reply(self, prompt):
+        if "Progressively summarize" in prompt:
+            return "The customer has been browsing used cars and asking about prices."
+        segment = prompt.rsplit("New input:", 1)[-1]
+        if "Observation:" in segment:
+            observation = segment.rsplit("Observation:", 1)[-1].strip()
+            return f"Thought: Do I need to use a tool? No\nAI: Here's what I found. {observation[:400]}"
+        user_input = segment.strip().split("\n", 1)[0].lower()
+        model = self._find_model(user_input)
+        if re.search(r"\b(compare|comparison|other dealers)\b", user_input):
+            action, action_input = "ComparePrices", model
+        elif re.search(r"\bwhy\b", user_input):
+            action, action_input = "WhyBuyFromUs", model
+        elif re.search(r"\b(suvs?|under|below)\b", user_input):
+            action, action_input = "SearchInventory", "body_type=suv, max_price=25000"
+        elif re.search(r"\b(what cars|list|in stock)\b", user_input):
+            action, action_input = "ListAvailableCars", ""
+        elif re.search(r"\b(details?|tell me|about|price|cost)\b", user_input):
+            action, action_input = "GetCarDetails", model
+        else:
+            return "Thought: Do I need to use a tool? No\nAI: Happy to help! Which car are you interested in?"
+        return f"Thought: Do I need to use a tool? Yes\nAction: {action}\nAction Input: {action_input}"
+
+    def _usage(self, prompt, reply):
+        input_tokens, output_tokens = _estimate_tokens(prompt), _estimate_tokens(reply)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = get_buffer_string(messages)
+        time.sleep(self.latency)
+        reply = self._reply(prompt)
+        message = AIMessage(content=reply, usage_metadata=self._usage(prompt, reply))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = get_buffer_string(messages)
+        time.sleep(self.latency)
+        reply = self._reply(prompt)
+        tokens = re.findall(r"\s*\S+", reply)
+        for i, token in enumerate(tokens):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            usage = self._usage(prompt, reply) if i == len(tokens) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
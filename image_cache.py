@@ -0,0 +1,258 @@
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow images are cached at their original size
+    Image = None
+
+MAX_DOWNLOAD_BYTES = 10 * 1024 * 1024
+USER_AGENT = "Mozilla/5.0 (compatible; car-sales-chatbot)"
+
+
+def download(url, timeout=10):
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        content_type = response.headers.get_content_type()
+        data = response.read(MAX_DOWNLOAD_BYTES + 1)
+    if len(data) > MAX_DOWNLOAD_BYTES:
+        raise ValueError(f"image larger than {MAX_DOWNLOAD_BYTES} bytes")
+    return data, content_type
+
+
+# JPEG thumbnail no wider than `width`, or None if Pillow cannot read the image
+def make_thumbnail(data, width):
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail((width, width * 2))
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=80, optimize=True)
+            return out.getvalue()
+    except Exception:
+        return None
+
+
+# Car photos from search results, downloaded in parallel, deduplicated by
+# content hash, shrunk to thumbnails and kept on disk under max_bytes (least
+# recently used files go first). Concurrent requests for the same URL share
+# one download, and a URL that failed is not tried again for retry_after
+# seconds. index.json maps URLs to content hashes across restarts. With
+# max_bytes <= 0 the cache is off: nothing is downloaded, and files already
+# in cache_dir are left alone.
+class ImageCache:
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, thumb_width=480, workers=8, background_workers=2,
+                 timeout=10, retry_after=3600, fetch=download, registry=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.thumb_width = thumb_width
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.fetch = fetch
+        self.registry = registry
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images")
+        # Startup prefetch gets its own small pool so it never delays a render
+        self._background = ThreadPoolExecutor(max_workers=background_workers, thread_name_prefix="images-prefetch")
+        self._lock = threading.Lock()
+        self._files = OrderedDict()  # content hash -> (path, size), least recent first
+        self._urls = {}  # url -> content hash
+        self._pending = {}  # url -> Future
+        self._queued_background = set()  # Futures submitted to the prefetch pool
+        self._failed = {}  # url -> time of the last failed download
+        self.prefetch_thread = None
+        self._bytes = 0
+        self._counters = {"hits": 0, "downloads": 0, "duplicates": 0, "failures": 0, "evictions": 0}
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name != "index.json" and not name.endswith(".tmp") and os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        for _, digest, path, size in sorted(files):
+            self._files[digest] = (path, size)
+            self._bytes += size
+        try:
+            with open(self._index_path) as f:
+                self._urls = {url: digest for url, digest in json.load(f).items() if digest in self._files}
+        except (OSError, ValueError):
+            self._urls = {}
+        self._evict()
+
+    def _save_index(self):
+        with self._lock:
+            index = dict(self._urls)
+        tmp_path = f"{self._index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _evict(self):
+        while self.enabled and self._bytes > self.max_bytes and self._files:
+            digest, (path, size) = self._files.popitem(last=False)
+            self._bytes -= size
+            self._counters["evictions"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Cached file for a URL, marked as recently used; None when not cached
+    def get(self, url):
+        with self._lock:
+            digest = self._urls.get(url)
+            entry = self._files.get(digest) if digest else None
+            if entry is None:
+                return None
+            self._files.move_to_end(digest)
+            self._counters["hits"] += 1
+        try:
+            os.utime(entry[0])
+        except OSError:
+            return None
+        return entry[0]
+
+    def _store(self, url, data, content_type):
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._files:
+                self._urls[url] = digest
+                self._files.move_to_end(digest)
+                self._counters["duplicates"] += 1
+                return self._files[digest][0]
+        thumbnail = make_thumbnail(data, self.thumb_width) if Image else None
+        if thumbnail is not None:
+            data, extension = thumbnail, ".jpg"
+        else:
+            extension = mimetypes.guess_extension(content_type or "") or ".img"
+        path = os.path.join(self.cache_dir, digest + extension)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._urls[url] = digest
+            if digest not in self._files:
+                self._files[digest] = (path, len(data))
+                self._bytes += len(data)
+            self._evict()
+        return path
+
+    def _download(self, url):
+        try:
+            started = time.perf_counter()
+            data, content_type = self.fetch(url, timeout=self.timeout)
+            path = self._store(url, data, content_type)
+            if self.registry:
+                self.registry.observe("image_download_seconds", time.perf_counter() - started)
+            with self._lock:
+                self._counters["downloads"] += 1
+            return path
+        except Exception as e:
+            print(f"[images] could not cache {url}: {e}")
+            with self._lock:
+                self._counters["failures"] += 1
+                self._failed[url] = time.monotonic()
+            if self.registry:
+                self.registry.inc("image_download_errors_total")
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(url, None)
+
+    # Starts downloads for URLs that are not cached, in progress or recently failed
+    def prefetch(self, urls, background=False):
+        futures = {}
+        if not self.enabled:
+            return futures
+        for url in urls:
+            if self.get(url):
+                continue
+            with self._lock:
+                failed_at = self._failed.get(url)
+                if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+                    continue
+                future = self._pending.get(url)
+                # A render does not wait behind the startup prefetch: a URL
+                # still queued there moves to the main pool
+                if (future is not None and not background and future in self._queued_background
+                        and future.cancel()):
+                    future = None
+                if future is None:
+                    executor = self._background if background else self._executor
+                    future = self._pending[url] = executor.submit(self._download, url)
+                    if background:
+                        self._queued_background.add(future)
+                        future.add_done_callback(self._queued_background.discard)
+            futures[url] = future
+        return futures
+
+    # Cached paths for the URLs, downloading what is missing in parallel.
+    # Failed downloads are left out, and so are images already returned for
+    # another URL.
+    def fetch_all(self, urls, timeout=None, background=False):
+        if not self.enabled:
+            return []
+        paths = {url: self.get(url) for url in urls}
+        missing = [url for url, path in paths.items() if path is None]
+        if missing:
+            futures = self.prefetch(missing, background)
+            for url in missing:
+                if url not in futures:
+                    paths[url] = self.get(url)
+                    continue
+                try:
+                    paths[url] = futures[url].result(timeout=timeout or self.timeout)
+                except Exception:
+                    paths[url] = None
+            self._save_index()
+        unique = []
+        for url in urls:
+            if paths[url] and paths[url] not in unique:
+                unique.append(paths[url])
+        return unique
+
+    # Warms the cache for every model in the background; image_urls(model)
+    # returns the URLs to cache for it.
+    def prefetch_in_background(self, models, image_urls):
+        def run():
+            started = time.perf_counter()
+            for model in models:
+                try:
+                    self.fetch_all(image_urls(model), background=True)
+                except Exception as e:
+                    print(f"[images] prefetch failed for {model}: {e}")
+            print(f"[images] prefetched {len(models)} models in {time.perf_counter() - started:.1f} s, "
+                  f"{self.stats()['files']} images cached")
+        self.prefetch_thread = threading.Thread(target=run, name="image-prefetch", daemon=True)
+        self.prefetch_thread.start()
+        return self.prefetch_thread
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["files"] = len(self._files)
+            stats["bytes"] = self._bytes
+            stats["pending"] = len(self._pending)
+        return stats
@@ -0,0 +1,92 @@
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from conversation_memory import estimate_message_tokens, estimate_tokens
+
+
+def _usage(response):
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if prompt_tokens or completion_tokens:
+        return prompt_tokens, completion_tokens
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return None
+
+
+def _completion_text(response):
+    return "".join(generation.text for generations in response.generations for generation in generations)
+
+
+# Times every LLM call and tool run in one turn. LLM latency, errors and token
+# counts go to the registry as they happen; the per-call spans are kept for the
+# turn's trace. Token counts come from the provider's usage metadata, or are
+# estimated from the text when it has none.
+class InstrumentationHandler(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.spans = []
+        self._open = {}  # run_id -> (kind, name, started, estimated prompt tokens)
+
+    def _start(self, run_id, kind, name, prompt_tokens=None):
+        self._open[run_id] = (kind, name, time.perf_counter(), prompt_tokens)
+
+    def _end(self, run_id, **fields):
+        kind, name, started, prompt_tokens = self._open.pop(run_id, (None, None, time.perf_counter(), None))
+        span = {"kind": kind, "name": name, "ms": (time.perf_counter() - started) * 1000, **fields}
+        self.spans.append(span)
+        return span, prompt_tokens
+
+    def on_llm_start(self, serialized, prompts, run_id=None, **kwargs):
+        self._start(run_id, "llm", (serialized or {}).get("name", "llm"), sum(estimate_tokens(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        self._start(run_id, "llm", (serialized or {}).get("name", "llm"),
+                    sum(estimate_message_tokens(batch) for batch in messages))
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        span, estimated_prompt = self._end(run_id)
+        usage = _usage(response)
+        if usage is None:
+            usage = (estimated_prompt or 0, estimate_tokens(_completion_text(response)))
+            span["estimated"] = True
+        span["prompt_tokens"], span["completion_tokens"] = usage
+        self.registry.observe("llm_call_seconds", span["ms"] / 1000)
+        self.registry.inc("llm_prompt_tokens_total", usage[0])
+        self.registry.inc("llm_completion_tokens_total", usage[1])
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        span, _ = self._end(run_id, error=str(error))
+        self.registry.observe("llm_call_seconds", span["ms"] / 1000)
+        self.registry.inc("llm_call_errors_total")
+
+    # Tool latency and errors reach the registry through the tool wrappers,
+    # which also cover calls made outside the agent; here they only feed the trace.
+    def on_tool_start(self, serialized, input_str, run_id=None, **kwargs):
+        self._start(run_id, "tool", (serialized or {}).get("name", "tool"))
+
+    def on_tool_end(self, output, run_id=None, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, run_id=None, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def stats(self):
+        llm_spans = [span for span in self.spans if span["kind"] == "llm"]
+        return {
+            "llm_calls": len(llm_spans),
+            "llm_ms": sum(span["ms"] for span in llm_spans),
+            "prompt_tokens": sum(span.get("prompt_tokens", 0) for span in llm_spans),
+            "completion_tokens": sum(span.get("completion_tokens", 0) for span in llm_spans),
+            "tool_calls": sum(span["kind"] == "tool" for span in self.spans),
+            "tool_ms": sum(span["ms"] for span in self.spans if span["kind"] == "tool"),
+        }
@@ -0,0 +1,142 @@
+import re
+import statistics
+import threading
+import time
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9\-]*")
+
+LIST_PATTERNS = [
+    re.compile(r"\b(what|which)\b.*\b(cars?|vehicles?|models?|stock|inventory)\b.*\b(have|got|available|offer|sell|carry)\b"),
+    re.compile(r"\b(list|show)\b( me)?( all)?( of)?( your| the)? (cars|vehicles|stock|inventory|models)\b"),
+    re.compile(r"\bwhat('?s| is)\b.*\b(in stock|available)\b"),
+]
+DETAIL_PATTERNS = [
+    re.compile(r"\b(details?|tell me about|more about|info|information|specs?|specifications|describe|show me|"
+               r"mileage|interior|condition|pictures?|photos?|images?)\b"),
+]
+PRICE_PATTERNS = [
+    re.compile(r"\b(price|prices|priced|cost|costs|how much)\b"),
+]
+# Needs live market data, a comparison or reasoning: leave it to the agent
+AGENT_ONLY_PATTERNS = [
+    re.compile(r"\b(compare|comparison|cheaper|market|online|other dealers?|competitors?|why|should i|vs|versus|"
+               r"better|recommend|best|finance|financing|loan|trade|deal|discount|negotiate)\b"),
+    # Attribute constraints go to the SearchInventory tool
+    re.compile(r"\b(under|below|over|above|less than|more than|between|cheapest|sedans?|suvs?|trucks?|"
+               r"coupes?|hatchbacks?|wagons?|electric|hybrid)\b|\$|\d{2,}\s*k\b"),
+]
+# One-word aliases that are ordinary words or numbers too ("golf cart",
+# "mini van", "land", "1500 miles"); the full model name still matches
+GENERIC_ALIASES = {"golf", "mini", "land", "1500"}
+# Words that may follow a make without naming another model ("honda price",
+# "is the toyota still available?")
+MAKE_FOLLOWERS = {
+    "price", "prices", "priced", "cost", "costs", "details", "detail", "info", "information", "specs", "spec",
+    "specifications", "mileage", "interior", "condition", "pictures", "picture", "photos", "photo", "images", "image",
+    "available", "still", "for", "sale", "in", "stock", "now", "today", "please", "pls", "you", "have", "got", "car",
+    "is", "it", "the", "a", "of", "do", "does",
+}
+
+
+# Answers prompts that only need the local stock (listing cars, a model's
+# details or price) without the ReAct loop. Anything it is not confident
+# about returns None and goes to the agent.
+class IntentRouter:
+    def __init__(self, index, handlers, max_ngram=4):
+        self.index = index
+        self.handlers = handlers  # route name -> callable(model) or callable()
+        self.max_ngram = max_ngram
+        self._lock = threading.Lock()
+        self._latencies = {}  # route -> recent latencies in ms
+        self._counts = {}
+
+    def find_models(self, text):
+        words = _WORD.findall(text)
+        found = {}
+        covered = set()  # positions of words inside a matched phrase
+        makes = {}  # model -> position of its make, when named by the make alone
+        for size in range(min(self.max_ngram, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                span = range(start, start + size)
+                if phrase in self.index:
+                    found.setdefault(phrase, 1.0)
+                    covered.update(span)
+                    continue
+                alias = self.index.lookup_alias(phrase) if phrase not in GENERIC_ALIASES else None
+                if alias and phrase == alias.split()[0]:
+                    makes.setdefault(alias, start)
+                    continue
+                if alias:
+                    found.setdefault(alias, 1.0)
+                    covered.update(span)
+                    continue
+                # Fuzzy matches only for multi-word phrases, single words are too noisy
+                if size > 1 and len(phrase) >= 6:
+                    for model, score in self.index.top_k(phrase, k=1):
+                        found[model] = max(score, found.get(model, 0))
+                        covered.update(span)
+        # A make stands for its only stocked model unless another word follows
+        # it, which is likely a model we don't have ("honda civic", "toyota camry")
+        for model, position in makes.items():
+            following = enumerate(words[position + 1:], position + 1)
+            if all(i in covered or word in MAKE_FOLLOWERS for i, word in following):
+                found.setdefault(model, 1.0)
+        return found
+
+    def classify(self, prompt):
+        text = prompt.lower().strip()
+        if not text or any(p.search(text) for p in AGENT_ONLY_PATTERNS):
+            return None, None
+        models = self.find_models(text)
+        if not models:
+            if "list" in self.handlers and any(p.search(text) for p in LIST_PATTERNS):
+                return "list", None
+            return None, None
+        if len(models) > 1:
+            return None, None
+        model = next(iter(models))
+        if "price" in self.handlers and any(p.search(text) for p in PRICE_PATTERNS):
+            return "price", model
+        if "details" in self.handlers and any(p.search(text) for p in DETAIL_PATTERNS):
+            return "details", model
+        if "details" in self.handlers and len(text.split()) <= len(model.split()) + 1:
+            # A bare model name ("audi a4?") is a request for its details
+            return "details", model
+        return None, None
+
+    def route(self, prompt):
+        started = time.perf_counter()
+        route, model = self.classify(prompt)
+        if route is None:
+            self.record("fallthrough", (time.perf_counter() - started) * 1000)
+            return None
+        handler = self.handlers[route]
+        result = handler(model) if model else handler()
+        self.record(route, (time.perf_counter() - started) * 1000)
+        return route, result
+
+    def record(self, route, elapsed_ms):
+        with self._lock:
+            self._counts[route] = self._counts.get(route, 0) + 1
+            latencies = self._latencies.setdefault(route, [])
+            latencies.append(elapsed_ms)
+            del latencies[:-500]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = {route: list(values) for route, values in self._latencies.items()}
+        fast = sum(n for route, n in counts.items() if route in self.handlers)
+        total = fast + counts.get("fallthrough", 0)
+        return {
+            "hit_rate": fast / total if total else 0.0,
+            "routes": {
+                route: {
+                    "count": counts[route],
+                    "p50_ms": statistics.median(values),
+                    "max_ms": max(values),
+                }
+                for route, values in latencies.items()
+            },
+        }
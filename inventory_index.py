@@ -0,0 +1,174 @@
+import threading
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+
+
+def _ngrams(text, n):
+    padded = f" {text} "
+    if len(padded) < n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+# Fuzzy lookup over stock model names. Candidates come from an n-gram inverted
+# index and are then scored with the same SequenceMatcher ratio that
+# difflib.get_close_matches uses, so resolve() agrees with
+# get_close_matches(query, keys, n=1, cutoff=cutoff) without scanning every key.
+# Keys are numbered and posting lists are kept as NumPy id arrays, so counting
+# shared n-grams for a query is one bincount instead of a Python loop over
+# every key that shares a common n-gram such as " to".
+class InventoryIndex:
+    def __init__(self, keys=(), cutoff=0.7, ngram=3, max_candidates=24):
+        self.cutoff = cutoff
+        self.ngram = ngram
+        self.max_candidates = max_candidates
+        self._keys = {}  # key -> id
+        self._names = []  # id -> key, None once removed
+        self._lengths = []  # id -> len(key)
+        self._gram_counts = []  # id -> number of distinct n-grams
+        self._postings = defaultdict(set)  # n-gram -> ids of keys containing it
+        self._posting_arrays = {}  # n-gram -> sorted id array, rebuilt after changes
+        self._columns = None  # (lengths, gram counts) as arrays, rebuilt after changes
+        self._aliases = defaultdict(set)  # alias -> keys it may refer to
+        self._lock = threading.RLock()
+        for key in keys:
+            self.add(key)
+        # Build the arrays for the initial stock now rather than on the first queries
+        for gram in self._postings:
+            self._posting_array(gram)
+        self._key_columns()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    # Short names customers use for a car: "mustang" for "ford mustang",
+    # "porsche" for "porsche 911".
+    @staticmethod
+    def _aliases_for(key):
+        words = key.split()
+        aliases = {key}
+        if len(words) > 1:
+            aliases.add(words[0])
+            aliases.add(" ".join(words[1:]))
+        return aliases
+
+    def add(self, key):
+        with self._lock:
+            if key in self._keys:
+                return
+            key_id = self._keys[key] = len(self._names)
+            grams = _ngrams(key, self.ngram)
+            self._names.append(key)
+            self._lengths.append(len(key))
+            self._gram_counts.append(len(grams))
+            self._columns = None
+            for gram in grams:
+                self._postings[gram].add(key_id)
+                self._posting_arrays.pop(gram, None)
+            for alias in self._aliases_for(key):
+                self._aliases[alias].add(key)
+
+    def remove(self, key):
+        with self._lock:
+            if key not in self._keys:
+                return
+            key_id = self._keys.pop(key)
+            self._names[key_id] = None
+            for gram in _ngrams(key, self.ngram):
+                self._postings[gram].discard(key_id)
+                self._posting_arrays.pop(gram, None)
+                if not self._postings[gram]:
+                    del self._postings[gram]
+            for alias in self._aliases_for(key):
+                self._aliases[alias].discard(key)
+                if not self._aliases[alias]:
+                    del self._aliases[alias]
+
+    def lookup_alias(self, alias):
+        keys = self._aliases.get(alias.lower().strip())
+        if keys and len(keys) == 1:
+            return next(iter(keys))
+        return None
+
+    def _posting_array(self, gram):
+        ids = self._posting_arrays.get(gram)
+        if ids is None:
+            ids = self._posting_arrays[gram] = np.fromiter(sorted(self._postings[gram]), dtype=np.int32)
+        return ids
+
+    def _key_columns(self):
+        if self._columns is None:
+            self._columns = (np.array(self._lengths, dtype=np.float64), np.array(self._gram_counts, dtype=np.float64))
+        return self._columns
+
+    # (shortlist, rest): keys that share an n-gram with the query and are long
+    # enough to reach the cutoff, split into the max_candidates with the most
+    # overlap and the others
+    def _candidates(self, query):
+        query_grams = _ngrams(query, self.ngram)
+        postings = [self._posting_array(gram) for gram in query_grams if gram in self._postings]
+        if not postings:
+            return [], []
+        lengths, gram_counts = self._key_columns()
+        shared = np.bincount(np.concatenate(postings), minlength=len(self._names))
+        ids = np.flatnonzero(shared > 0)
+        # Only keys whose length allows ratio >= cutoff are worth scoring
+        query_len = len(query)
+        ids = ids[2.0 * np.minimum(lengths[ids], query_len) / (lengths[ids] + query_len) >= self.cutoff]
+        # Rank by Dice overlap so long keys that merely contain the query's
+        # n-grams don't crowd out closer, shorter ones. Keys tied with the
+        # last place are kept, so the result does not depend on id order.
+        dice = 2.0 * shared[ids] / (len(query_grams) + gram_counts[ids])
+        rest = ids[:0]
+        if len(ids) > self.max_candidates:
+            top = dice >= np.partition(dice, -self.max_candidates)[-self.max_candidates]
+            ids, rest = ids[top], ids[~top]
+        return [self._names[key_id] for key_id in ids.tolist()], [self._names[key_id] for key_id in rest.tolist()]
+
+    def top_k(self, query, k=5):
+        query = query.lower()
+        with self._lock:
+            if query in self._keys:
+                return [(query, 1.0)]
+            shortlist, rest = self._candidates(query)
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = self._score(matcher, shortlist, k)
+        # N-gram overlap only approximates the ratio, so when nothing on the
+        # shortlist clears the cutoff the other candidates are scored as well
+        if not scored and rest:
+            scored = self._score(matcher, rest, k)
+        return [(key, score) for score, key in scored[:k]]
+
+    # Up to k (ratio, key) pairs at or above the cutoff, best first. quick_ratio()
+    # is an upper bound on ratio(), so candidates are scored best bound first
+    # and the rest skipped once they cannot reach the k-th best score.
+    def _score(self, matcher, candidates, k):
+        bounded = []
+        for key in candidates:
+            matcher.set_seq1(key)
+            if matcher.real_quick_ratio() >= self.cutoff:
+                bound = matcher.quick_ratio()
+                if bound >= self.cutoff:
+                    bounded.append((bound, key))
+        bounded.sort(reverse=True)
+        scored = []
+        for bound, key in bounded:
+            if len(scored) >= k and bound < scored[k - 1][0]:
+                break
+            matcher.set_seq1(key)
+            score = matcher.ratio()
+            if score >= self.cutoff:
+                scored.append((score, key))
+                # Same tie-breaking as get_close_matches: highest score, then highest key
+                scored.sort(reverse=True)
+        return scored[:k]
+
+    def resolve(self, query):
+        matches = self.top_k(query, k=1)
+        return matches[0][0] if matches else None
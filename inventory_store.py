@@ -0,0 +1,174 @@
+import csv
+import hashlib
+import os
+import re
+from collections.abc import Mapping
+
+import numpy as np
+
+NUMERIC_COLUMNS = ("year", "price", "mileage")
+TEXT_COLUMNS = ("model", "body_type", "interior", "details", "benefits")
+SORTABLE_COLUMNS = NUMERIC_COLUMNS + ("model",)
+
+
+# Column-oriented stock: one NumPy array per attribute, so filters and sorts
+# over price, mileage, year and body type run as vectorized operations.
+# Behaves like the old {model: {...}} dict for lookups and iteration.
+class InventoryStore(Mapping):
+    def __init__(self, columns):
+        missing = [name for name in NUMERIC_COLUMNS + TEXT_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"Inventory is missing columns: {', '.join(missing)}")
+        self.columns = columns
+        self._rows = {str(model): i for i, model in enumerate(columns["model"])}
+        self._version = None
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        columns = {}
+        for name in NUMERIC_COLUMNS:
+            columns[name] = np.array([int(float(r[name])) for r in records], dtype=np.int64)
+        for name in TEXT_COLUMNS:
+            values = [str(r[name]).strip() for r in records]
+            if name in ("model", "body_type"):
+                values = [v.lower() for v in values]
+            columns[name] = np.array(values, dtype=str)
+        return cls(columns)
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline="") as f:
+            return cls.from_records(csv.DictReader(f))
+
+    @classmethod
+    def from_parquet(cls, path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Loading Parquet inventory requires pyarrow: pip install pyarrow")
+        table = pq.read_table(path).to_pydict()
+        return cls.from_records(dict(zip(table, row)) for row in zip(*table.values()))
+
+    @classmethod
+    def load(cls, path, mmap_dir=None):
+        # With mmap_dir set, the columns are written once as .npy files and
+        # memory-mapped, so every worker on the host shares the same pages.
+        if mmap_dir and os.path.isfile(os.path.join(mmap_dir, "model.npy")):
+            if os.path.getmtime(os.path.join(mmap_dir, "model.npy")) >= os.path.getmtime(path):
+                return cls.from_mmap_dir(mmap_dir)
+        if path.endswith(".parquet"):
+            store = cls.from_parquet(path)
+        else:
+            store = cls.from_csv(path)
+        if mmap_dir:
+            store.save_mmap_dir(mmap_dir)
+            return cls.from_mmap_dir(mmap_dir)
+        return store
+
+    def save_mmap_dir(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, values in self.columns.items():
+            tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp_path, values)
+            os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+    @classmethod
+    def from_mmap_dir(cls, directory):
+        return cls({
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in NUMERIC_COLUMNS + TEXT_COLUMNS
+        })
+
+    # Content hash of the stock; changes when any car or attribute does
+    @property
+    def version(self):
+        if self._version is None:
+            digest = hashlib.sha1()
+            for name in sorted(self.columns):
+                digest.update(name.encode())
+                digest.update(np.ascontiguousarray(self.columns[name]).tobytes())
+            self._version = digest.hexdigest()[:12]
+        return self._version
+
+    def record(self, row):
+        record = {name: int(self.columns[name][row]) for name in NUMERIC_COLUMNS}
+        record.update({name: str(self.columns[name][row]) for name in TEXT_COLUMNS})
+        return record
+
+    def __getitem__(self, model):
+        return self.record(self._rows[model])
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def body_types(self):
+        return sorted(set(str(v) for v in self.columns["body_type"]))
+
+    def query(self, body_type=None, min_price=None, max_price=None, max_mileage=None,
+              min_year=None, max_year=None, sort_by="price", descending=False, limit=None):
+        mask = np.ones(len(self), dtype=bool)
+        if body_type:
+            mask &= self.columns["body_type"] == body_type.lower()
+        if min_price is not None:
+            mask &= self.columns["price"] >= min_price
+        if max_price is not None:
+            mask &= self.columns["price"] <= max_price
+        if max_mileage is not None:
+            mask &= self.columns["mileage"] <= max_mileage
+        if min_year is not None:
+            mask &= self.columns["year"] >= min_year
+        if max_year is not None:
+            mask &= self.columns["year"] <= max_year
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort_by!r}; use one of {', '.join(SORTABLE_COLUMNS)}")
+        if limit is not None and limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        rows = np.flatnonzero(mask)
+        order = np.argsort(self.columns[sort_by][rows], kind="stable")
+        if descending:
+            order = order[::-1]
+        rows = rows[order]
+        if limit is not None:
+            rows = rows[:limit]
+        return [self.record(row) for row in rows]
+
+
+_QUERY_FIELDS = {
+    "body_type": str, "min_price": int, "max_price": int, "max_mileage": int,
+    "min_year": int, "max_year": int, "sort_by": str, "descending": bool, "limit": int,
+}
+
+
+def _parse_number(value):
+    value = value.strip().lower().replace("$", "").replace(",", "")
+    multiplier = 1000 if value.endswith("k") else 1
+    return int(float(value.rstrip("k")) * multiplier)
+
+
+# Parses the agent's "key=value, key=value" input for the SearchInventory tool,
+# e.g. "body_type=suv, max_price=25k, max_mileage=50000, sort_by=price".
+def parse_inventory_query(text):
+    filters = {}
+    for part in re.split(r"[,;\n]", text or ""):
+        if "=" not in part and ":" not in part:
+            continue
+        key, value = re.split(r"[=:]", part, maxsplit=1)
+        key = key.strip().lower().replace(" ", "_")
+        value = value.strip().strip("'\"")
+        if key not in _QUERY_FIELDS or not value:
+            continue
+        kind = _QUERY_FIELDS[key]
+        try:
+            if kind is int:
+                filters[key] = _parse_number(value)
+            elif kind is bool:
+                filters[key] = value.lower() in ("1", "true", "yes", "desc")
+            else:
+                filters[key] = value.lower()
+        except ValueError:
+            continue
+    return filters
@@ -0,0 +1,258 @@
+import atexit
+import csv
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: rely on the single writer thread per process
+    fcntl = None
+
+LEAD_FIELDS = ("name", "email", "whatsapp")
+
+
+def normalize_lead(lead):
+    whatsapp = str(lead.get("whatsapp", "")).strip()
+    return {
+        "name": " ".join(str(lead.get("name", "")).split()),
+        "email": str(lead.get("email", "")).strip().lower(),
+        "whatsapp": ("+" if whatsapp.startswith("+") else "") + re.sub(r"\D", "", whatsapp),
+    }
+
+
+def lead_key(lead):
+    return lead["email"], lead["whatsapp"]
+
+
+# Normalized leads from a CSV file. The original app only wrote a header when
+# leads.csv was missing, and the repo ships an empty one, so most existing
+# files have no header row; the first row is only a header if it names the
+# lead fields. Rows without an email or WhatsApp number are skipped.
+def read_csv_leads(path):
+    with open(path, newline="") as f:
+        first = next(csv.reader(f), None)
+        f.seek(0)
+        has_header = first is not None and tuple(cell.strip().lower() for cell in first) == LEAD_FIELDS
+        reader = csv.DictReader(f) if has_header else csv.DictReader(f, fieldnames=LEAD_FIELDS)
+        leads = [normalize_lead({key: value or "" for key, value in row.items() if key in LEAD_FIELDS})
+                 for row in reader]
+    return [lead for lead in leads if lead["email"] or lead["whatsapp"]]
+
+
+# Appends leads to a CSV file under an exclusive lock on a sidecar .lock file,
+# so several processes can share one file without interleaving rows or
+# writing the header twice. Leads already in the file are skipped.
+class CsvLeadBackend:
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _existing_keys(self):
+        if not os.path.isfile(self.path):
+            return set()
+        return {lead_key(lead) for lead in read_csv_leads(self.path)}
+
+    def write_batch(self, leads):
+        with self._locked():
+            seen = self._existing_keys()
+            needs_header = not os.path.isfile(self.path) or os.path.getsize(self.path) == 0
+            written = 0
+            with open(self.path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=LEAD_FIELDS)
+                if needs_header:
+                    writer.writeheader()
+                for lead in leads:
+                    if lead_key(lead) in seen:
+                        continue
+                    seen.add(lead_key(lead))
+                    writer.writerow(lead)
+                    written += 1
+            return written
+
+
+# SQLite in WAL mode with a unique index on (email, whatsapp). Rows from an
+# existing leads.csv are imported once, the first time the database is opened.
+class SqliteLeadBackend:
+    def __init__(self, path, migrate_csv=None):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leads ("
+                "id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                "whatsapp TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS leads_contact ON leads (email, whatsapp)")
+            conn.execute("CREATE TABLE IF NOT EXISTS lead_migrations (source TEXT PRIMARY KEY, migrated_at REAL NOT NULL)")
+        if migrate_csv:
+            self.migrate_csv(migrate_csv)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _insert(self, conn, leads):
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO leads (name, email, whatsapp, created_at) VALUES (?, ?, ?, ?)",
+            [(lead["name"], lead["email"], lead["whatsapp"], time.time()) for lead in leads],
+        )
+        return conn.total_changes - before
+
+    def migrate_csv(self, csv_path):
+        source = os.path.abspath(csv_path)
+        if not os.path.isfile(csv_path):
+            return 0
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM lead_migrations WHERE source = ?", (source,)).fetchone():
+                return 0
+            leads = read_csv_leads(csv_path)
+            migrated = self._insert(conn, leads)
+            conn.execute("INSERT INTO lead_migrations (source, migrated_at) VALUES (?, ?)", (source, time.time()))
+        print(f"[leads] migrated {migrated} leads from {csv_path}")
+        return migrated
+
+    def write_batch(self, leads):
+        with self._connect() as conn:
+            return self._insert(conn, leads)
+
+
+# Takes leads from the form without blocking on disk. A background thread
+# drains the queue and writes a batch when max_batch leads are waiting or the
+# oldest one has waited max_latency seconds. A batch the backend fails to
+# write is retried with exponential backoff; after max_attempts, or when the
+# sink closes, it is appended to fallback_path as JSON lines instead, since
+# the customer has already been told their details were recorded.
+class LeadSink:
+    def __init__(self, backend, max_batch=50, max_latency=1.0, max_queue=10000, retry_delay=0.5,
+                 max_retry_delay=30.0, max_attempts=8, fallback_path=None):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.fallback_path = fallback_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "rejected": 0, "flushes": 0, "written": 0, "duplicates": 0, "errors": 0,
+                          "retries": 0, "fallback": 0}
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lead-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, lead):
+        try:
+            self._queue.put_nowait(normalize_lead(lead))
+        except queue.Full:
+            with self._lock:
+                self._counters["rejected"] += 1
+            return False
+        with self._lock:
+            self._counters["submitted"] += 1
+        return True
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    # True once the backend has the batch
+    def _write(self, batch):
+        # Drop repeats within the batch before they reach the backend
+        unique = list({lead_key(lead): lead for lead in batch}.values())
+        try:
+            written = self.backend.write_batch(unique)
+        except Exception as e:
+            print(f"[leads] failed to write {len(batch)} leads: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return False
+        with self._lock:
+            self._counters["flushes"] += 1
+            self._counters["written"] += written
+            self._counters["duplicates"] += len(batch) - written
+        print(f"[leads] flushed {written} new of {len(batch)}, queue depth {self._queue.qsize()}")
+        return True
+
+    def _store(self, batch):
+        delay = self.retry_delay
+        for attempt in range(1, self.max_attempts + 1):
+            if self._write(batch):
+                return
+            if attempt == self.max_attempts or self._closed.is_set():
+                break
+            with self._lock:
+                self._counters["retries"] += 1
+            # Returns early when the sink closes, for one last attempt
+            self._closed.wait(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+        self._write_fallback(batch)
+
+    def _write_fallback(self, batch):
+        try:
+            if not self.fallback_path:
+                raise OSError("no fallback file configured")
+            with open(self.fallback_path, "a") as f:
+                f.write("".join(json.dumps(lead) + "\n" for lead in batch))
+        except OSError as e:
+            # Last resort: the log is the only place left for these leads
+            print(f"[leads] could not save {len(batch)} leads to the fallback file ({e}): {json.dumps(batch)}")
+            return
+        with self._lock:
+            self._counters["fallback"] += len(batch)
+        print(f"[leads] saved {len(batch)} unwritten leads to {self.fallback_path}")
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._store(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._closed.set()
+        self._thread.join(timeout=self.max_latency + 5)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
@@ -0,0 +1,20 @@
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+
+# Chat model that sends every generation of `inner` through an OutboundClient.
+# Callbacks, streaming and usage metadata behave as they do for `inner`.
+class ManagedChatModel(BaseChatModel):
+    inner: BaseChatModel
+    client: Any
+
+    @property
+    def _llm_type(self):
+        return self.inner._llm_type
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.client.call(self.inner._generate, messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield from self.client.stream(self.inner._stream, messages, stop=stop, run_manager=run_manager, **kwargs)
@@ -0,0 +1,178 @@
+import re
+import statistics
+import threading
+import time
+from collections import deque
+
+# Listing prices outside this range are typos, monthly payments or part prices
+MIN_PRICE = 1000
+MAX_PRICE = 500000
+
+_AMOUNT = r"(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s*(k|K|thousand)?"
+PRICE_RANGE_RE = re.compile(r"\$\s?" + _AMOUNT + r"\s*(?:-|–|—|to)\s*\$?\s?" + _AMOUNT)
+PRICE_RE = re.compile(r"\$\s?" + _AMOUNT + r"|\b" + _AMOUNT + r"\s*(?:USD|dollars)\b")
+# An amount followed by one of these is a mileage, a payment or a discount, not a price
+NOT_A_PRICE_RE = re.compile(
+    r"\s*(?:miles?\b|mi\b|kms?\b|kilomet|/\s*mo|per\s+month|a\s+month|monthly|mo\b|down\b|off\b|savings?\b)",
+    re.IGNORECASE,
+)
+
+
+def _to_number(digits, suffix):
+    value = float(digits.replace(",", ""))
+    return value * 1000 if suffix else value
+
+
+# All listing prices in a snippet: "$18,500", "$18.5k", "18500 USD", and
+# ranges such as "$18k-$22k" or "$18-22k", which count once at their midpoint.
+def extract_prices(text):
+    prices = []
+    taken = []
+    for match in PRICE_RANGE_RE.finditer(text):
+        if NOT_A_PRICE_RE.match(text, match.end()):
+            continue
+        low_digits, low_suffix, high_digits, high_suffix = match.groups()
+        high = _to_number(high_digits, high_suffix)
+        low = _to_number(low_digits, low_suffix or (high_suffix if float(low_digits.replace(",", "")) < 1000 else None))
+        if low <= high:
+            prices.append((low + high) / 2)
+            taken.append(match.span())
+    for match in PRICE_RE.finditer(text):
+        if any(start <= match.start() < end for start, end in taken):
+            continue
+        if NOT_A_PRICE_RE.match(text, match.end()):
+            continue
+        digits, suffix = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+        prices.append(_to_number(digits, suffix))
+    return [int(price) for price in prices if MIN_PRICE <= price <= MAX_PRICE]
+
+
+# Median and 10% trimmed mean after dropping samples outside the IQR fences
+def price_stats(prices):
+    if not prices:
+        return {"samples": 0, "outliers": 0, "median": None, "trimmed_mean": None, "low": None, "high": None}
+    kept = sorted(prices)
+    if len(kept) >= 4:
+        q1, _, q3 = statistics.quantiles(kept, n=4, method="inclusive")
+        fence = 1.5 * (q3 - q1)
+        kept = [price for price in kept if q1 - fence <= price <= q3 + fence]
+    trim = len(kept) // 10
+    trimmed = kept[trim:len(kept) - trim]
+    return {
+        "samples": len(kept),
+        "outliers": len(prices) - len(kept),
+        "median": statistics.median(kept),
+        "trimmed_mean": statistics.fmean(trimmed),
+        "low": kept[0],
+        "high": kept[-1],
+    }
+
+
+# Keeps a market-price snapshot per model in stock, refreshed in the
+# background every refresh_interval seconds, so price comparisons are a dict
+# lookup instead of a search. latest() only returns snapshots younger than
+# max_age. A refresh that finds no prices keeps the previous snapshot.
+class MarketPriceEngine:
+    def __init__(self, models, search, query_for, refresh_interval=21600, max_age=43200, history=5):
+        self.models = models  # callable returning the tracked models (a set or mapping)
+        self.search = search  # callable(query) -> Tavily-style response
+        self.query_for = query_for
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.history = history
+        self._lock = threading.Lock()
+        self._snapshots = {}  # model -> deque of snapshots, newest last
+        self._counters = {"refreshes": 0, "cycles": 0, "failures": 0, "empty": 0}
+        self._last_cycle = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot_from(self, model, response):
+        if not isinstance(response, dict) or not response.get("results"):
+            return None
+        prices = []
+        for result in response["results"]:
+            prices.extend(extract_prices(f"{result.get('title', '')} {result.get('content', '')}"))
+        first = response["results"][0]
+        return {
+            "model": model,
+            "fetched_at": time.time(),
+            "url": first.get("url"),
+            "excerpt": first.get("content", ""),
+            **price_stats(prices),
+        }
+
+    # Builds a snapshot from a search response; tracked models keep it
+    def ingest(self, model, response):
+        snapshot = self.snapshot_from(model, response)
+        if snapshot is None or not snapshot["samples"] or model not in self.models():
+            return snapshot
+        with self._lock:
+            snapshots = self._snapshots.setdefault(model, deque(maxlen=self.history))
+            snapshot["version"] = snapshots[-1]["version"] + 1 if snapshots else 1
+            snapshots.append(snapshot)
+        return snapshot
+
+    def refresh_model(self, model):
+        try:
+            response = self.search(self.query_for(model))
+        except Exception as e:
+            print(f"[market] refresh failed for {model}: {e}")
+            response = None
+        snapshot = self.ingest(model, response)
+        with self._lock:
+            self._counters["refreshes"] += 1
+            if snapshot is None:
+                self._counters["failures"] += 1
+            elif not snapshot["samples"]:
+                self._counters["empty"] += 1
+        return snapshot
+
+    def refresh_all(self):
+        started = time.perf_counter()
+        for model in self.models():
+            if self._stop.is_set():
+                return
+            self.refresh_model(model)
+        with self._lock:
+            self._counters["cycles"] += 1
+            self._last_cycle = time.time()
+        print(f"[market] refreshed {len(self._snapshots)} models in {time.perf_counter() - started:.1f} s")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._stop.wait(self.refresh_interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="market-prices", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self, model, max_age=None):
+        with self._lock:
+            snapshots = self._snapshots.get(model)
+            snapshot = snapshots[-1] if snapshots else None
+        max_age = self.max_age if max_age is None else max_age
+        if snapshot is None or time.time() - snapshot["fetched_at"] > max_age:
+            return None
+        return snapshot
+
+    def versions(self, model):
+        with self._lock:
+            return list(self._snapshots.get(model, ()))
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            stats = dict(self._counters)
+            ages = [now - snapshots[-1]["fetched_at"] for snapshots in self._snapshots.values()]
+            stats["last_cycle"] = self._last_cycle
+        stats["models"] = len(ages)
+        stats["fresh"] = sum(age <= self.max_age for age in ages)
+        stats["oldest_age_s"] = max(ages, default=None)
+        return stats
@@ -0,0 +1,178 @@
+import asyncio
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from timing import percentile
+
+# Upper bounds in seconds, from a cached lookup up to a slow agent turn
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+# Cumulative Prometheus buckets for export, plus the most recent samples for
+# live percentiles.
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep=1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=keep)
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+
+# Process-wide counters, gauges and latency histograms, keyed by name and labels.
+# timed() records "<base>_seconds" and counts exceptions in "<base>_errors_total".
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep=1024):
+        self.buckets = buckets
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # (name, labels) -> last value set
+        self._histograms = {}  # (name, labels) -> Histogram
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets, self.keep)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, base, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(f"{base}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"{base}_seconds", time.perf_counter() - started, **labels)
+
+    # Decorator form of timed() for plain functions and coroutines
+    def wrap(self, func, base, **labels):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                with self.timed(base, **labels):
+                    return await func(*args, **kwargs)
+            return timed_coroutine
+
+        @functools.wraps(func)
+        def timed_function(*args, **kwargs):
+            with self.timed(base, **labels):
+                return func(*args, **kwargs)
+        return timed_function
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    # One row per histogram with live percentiles in ms, for the admin panel
+    def summary(self):
+        with self._lock:
+            histograms = {key: (h.count, h.sum, list(h.recent)) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        rows = []
+        for (name, labels), (count, total, recent) in sorted(histograms.items()):
+            base = name[:-len("_seconds")] if name.endswith("_seconds") else name
+            rows.append({
+                "name": base,
+                "labels": dict(labels),
+                "count": count,
+                "errors": counters.get((f"{base}_errors_total", labels), 0),
+                "mean_ms": total / count * 1000 if count else None,
+                "p50_ms": percentile(recent, 50) * 1000 if recent else None,
+                "p95_ms": percentile(recent, 95) * 1000 if recent else None,
+                "p99_ms": percentile(recent, 99) * 1000 if recent else None,
+            })
+        return rows
+
+    def counters(self):
+        with self._lock:
+            items = sorted(self._counters.items()) + sorted(self._gauges.items())
+        return [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in items]
+
+    def to_prometheus(self, prefix="carbot_"):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, list(h.bucket_counts), h.count, h.sum) for key, h in self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}{name} counter")
+                typed.add(name)
+            lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}{name} gauge")
+                typed.add(name)
+            lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+        for (name, labels), bucket_counts, count, total in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{prefix}{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{prefix}{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    # Atomic rewrite, e.g. for the node_exporter textfile collector
+    def write_prometheus(self, path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+# Appends one JSON object per line; each line goes out in a single write so
+# several processes can share the file.
+class TraceWriter:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, event):
+        line = json.dumps({"ts": time.time(), **event}, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
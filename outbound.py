@@ -0,0 +1,220 @@
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+RETRYABLE_MESSAGE_RE = re.compile(
+    r"\b(408|429|500|502|503|504)\b|rate.?limit|too many requests|resource.?exhausted|quota|"
+    r"temporarily unavailable|overloaded|timed? ?out",
+    re.IGNORECASE,
+)
+
+
+# Raised instead of queueing when a provider is saturated: too many callers
+# already waiting, or no slot within max_wait seconds.
+class OutboundOverloaded(RuntimeError):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, OutboundOverloaded):
+        return False
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    for status in (getattr(error, "status_code", None), getattr(error, "code", None),
+                   getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS
+    return bool(RETRYABLE_MESSAGE_RE.search(str(error)))
+
+
+# Classic token bucket: `rate` calls per second on average, bursts of up to
+# `burst` calls. A caller with a reserve only takes a token while more than
+# `reserve` others are left.
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Takes a token, waiting until `deadline` (monotonic) at most. Returns the
+    # seconds waited, or None if the deadline passed first.
+    def acquire(self, deadline, reserve=0):
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1 + reserve:
+                    self._tokens -= 1
+                    return now - started
+                wait = (1 + reserve - self._tokens) / self.rate
+            if now + wait > deadline:
+                return None
+            time.sleep(wait)
+
+
+# Outbound call policy for one provider, shared by every session in the
+# process: identical in-flight calls (same key) share one request, calls are
+# paced by a token bucket and capped at max_concurrent, at most max_queue
+# callers wait for a slot, and retryable failures are retried with full-jitter
+# exponential backoff. Background calls (snapshot refreshes, prefetches) only
+# use leftover capacity: tokens beyond background_reserve, at most
+# max_background slots, and no place in the interactive queue. They wait up
+# to background_max_wait, and interactive callers never join them.
+class OutboundClient:
+    def __init__(self, provider, rate, burst, max_concurrent=8, max_queue=100, max_wait=30.0,
+                 retries=3, base_delay=0.5, max_delay=8.0, background_reserve=None, max_background=None,
+                 background_max_wait=None, registry=None):
+        self.provider = provider
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.background_reserve = burst // 2 if background_reserve is None else background_reserve
+        self.background_max_wait = background_max_wait or max_wait * 10
+        self.registry = registry
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._background_slots = threading.BoundedSemaphore(max_background or max(1, max_concurrent // 4))
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Future of the leading call
+        self._in_flight_background = {}
+        self._waiting = 0
+        self._waiting_background = 0
+        self._active = 0
+
+    def _inc(self, name, value=1):
+        if self.registry:
+            self.registry.inc(name, value, provider=self.provider)
+
+    def _gauges(self):
+        if self.registry:
+            self.registry.set_gauge("outbound_queue_depth", self._waiting, provider=self.provider)
+            self.registry.set_gauge("outbound_in_flight", self._active, provider=self.provider)
+
+    def _acquire(self, background=False):
+        with self._lock:
+            if background:
+                self._waiting_background += 1
+            elif self._waiting >= self.max_queue:
+                self._inc("outbound_rejected_total")
+                raise OutboundOverloaded(f"{self.provider}: {self._waiting} calls already waiting")
+            else:
+                self._waiting += 1
+                self._gauges()
+        max_wait = self.background_max_wait if background else self.max_wait
+        deadline = time.monotonic() + max_wait
+        try:
+            waited = None
+            if not background or self._background_slots.acquire(timeout=max_wait):
+                waited = self.bucket.acquire(deadline, self.background_reserve if background else 0)
+                if waited is not None and not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    waited = None
+                if waited is None and background:
+                    self._background_slots.release()
+        finally:
+            with self._lock:
+                if background:
+                    self._waiting_background -= 1
+                else:
+                    self._waiting -= 1
+                    self._gauges()
+        if waited is None:
+            self._inc("outbound_rejected_total")
+            raise OutboundOverloaded(f"{self.provider}: no capacity within {max_wait:g}s")
+        if waited > 0.001:
+            self._inc("outbound_deferred_total" if background else "outbound_throttled_total")
+        if self.registry:
+            self.registry.observe("outbound_wait_seconds", waited, provider=self.provider)
+        with self._lock:
+            self._active += 1
+            self._gauges()
+
+    def _release(self, background=False):
+        self._slots.release()
+        if background:
+            self._background_slots.release()
+        with self._lock:
+            self._active -= 1
+            self._gauges()
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        print(f"[outbound] {self.provider} call failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+        self._inc("outbound_retries_total")
+        time.sleep(delay)
+
+    def _call_with_retries(self, fn, args, kwargs, background=False):
+        for attempt in range(self.retries + 1):
+            self._acquire(background)
+            try:
+                if self.registry:
+                    with self.registry.timed("outbound_call", provider=self.provider):
+                        return fn(*args, **kwargs)
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.retries or not is_retryable(e):
+                    raise
+                error = e
+            finally:
+                self._release(background)
+            self._backoff(attempt, error)
+
+    def call(self, fn, *args, key=None, background=False, **kwargs):
+        if key is None:
+            return self._call_with_retries(fn, args, kwargs, background)
+        # A background call may be waiting for leftover capacity, so only
+        # other background calls join it
+        in_flight = self._in_flight_background if background else self._in_flight
+        with self._lock:
+            leader = self._in_flight.get(key) or (background and in_flight.get(key))
+            if not leader:
+                future = in_flight[key] = Future()
+        if leader:
+            self._inc("outbound_coalesced_total")
+            return leader.result()
+        try:
+            result = self._call_with_retries(fn, args, kwargs, background)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del in_flight[key]
+
+    # Streaming calls are retried only until their first chunk arrives; the
+    # slot is held until the stream is exhausted or closed.
+    def stream(self, fn, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self._acquire()
+            try:
+                iterator = iter(fn(*args, **kwargs))
+                first = next(iterator, None)
+            except Exception as e:
+                self._release()
+                if attempt == self.retries or not is_retryable(e):
+                    raise
+                self._backoff(attempt, e)
+                continue
+            try:
+                if first is not None:
+                    yield first
+                    yield from iterator
+            finally:
+                self._release()
+            return
+
+    def stats(self):
+        with self._lock:
+            return {"waiting": self._waiting, "waiting_background": self._waiting_background, "active": self._active,
+                    "in_flight_keys": len(self._in_flight) + len(self._in_flight_background)}
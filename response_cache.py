@@ -0,0 +1,150 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Words that do not change what is being asked
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "you", "your", "we", "us", "our", "please", "pls", "can", "could", "would",
+    "will", "do", "does", "is", "are", "be", "of", "for", "to", "on", "in", "at", "from", "with", "about", "some",
+    "any", "hi", "hey", "hello", "there", "just", "so", "and", "or", "what", "s", "should", "want", "like", "know",
+}
+# The answer depends on earlier turns ("is it automatic?", "the cheaper one")
+CONTEXT_RE = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|one|ones|same|another|else|previous|above|earlier|instead|"
+    r"again|also|too|then)\b"
+)
+# Personal details or requests that must reach the agent every time
+PERSONAL_RE = re.compile(
+    r"\b(contact|whatsapp|email|e-mail|phone|call|book|booking|appointment|test drive|my name|i am|i'm|im|"
+    r"budget|afford|trade|finance|financing|loan)\b"
+)
+# Answers that report a failure are not worth repeating
+FAILED_ANSWER_RE = re.compile(r"could not retrieve|error during|taking too long|an error occurred|try again",
+                              re.IGNORECASE)
+
+
+def _answer_size(answer):
+    if isinstance(answer, dict):
+        return len(answer.get("details", "")) + sum(len(url) for url in answer.get("images", ()))
+    return len(str(answer))
+
+
+# Final agent answers for context-independent prompts. A prompt is reduced to
+# the stock models it mentions (aliases and typos resolved by find_models)
+# plus its remaining content words; prompts about the same models whose word
+# sets overlap by at least `similarity` (Jaccard) share an answer. Entries are
+# keyed by version(models), e.g. the inventory version and the market
+# snapshots of those models, so stock or price changes miss the cache.
+class ResponseCache:
+    def __init__(self, find_models, version, max_entries=512, max_bytes=5_000_000, ttl=3600, similarity=0.8,
+                 max_words=24):
+        self.find_models = find_models
+        self.version = version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_words = max_words
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (bucket, words) -> entry, least recent first
+        self._buckets = {}  # bucket -> set of words keys
+        self._bytes = 0
+        self._counters = {"hits": 0, "near_hits": 0, "misses": 0, "skipped": 0, "stored": 0, "evictions": 0}
+
+    # (models, content words) for a cacheable prompt, None otherwise
+    def normalize(self, prompt):
+        text = prompt.lower().replace("’", "'")
+        words = _WORD.findall(text)
+        if not words or len(words) > self.max_words or CONTEXT_RE.search(text) or PERSONAL_RE.search(text):
+            return None
+        models = tuple(sorted(self.find_models(text)))
+        model_words = {word for model in models for word in _WORD.findall(model)}
+        content = frozenset(word for word in words if word not in STOPWORDS and word not in model_words)
+        # Greetings and "what can you do?" carry nothing to key on
+        if not models and not content:
+            return None
+        return models, content
+
+    def _key(self, prompt):
+        normalized = self.normalize(prompt)
+        if normalized is None:
+            return None
+        models, words = normalized
+        return (models, self.version(models)), words
+
+    def get(self, prompt):
+        key = self._key(prompt)
+        now = time.monotonic()
+        with self._lock:
+            if key is None:
+                self._counters["skipped"] += 1
+                return None
+            bucket, words = key
+            match, result = None, "hits"
+            if (bucket, words) in self._entries:
+                match = words
+            else:
+                best = 0.0
+                for candidate in self._buckets.get(bucket, ()):
+                    union = len(words | candidate)
+                    score = len(words & candidate) / union if union else 1.0
+                    if score >= self.similarity and score > best:
+                        match, best, result = candidate, score, "near_hits"
+            entry = self._entries.get((bucket, match)) if match is not None else None
+            if entry is None or entry["expires_at"] < now:
+                if entry is not None:
+                    self._remove((bucket, match))
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end((bucket, match))
+            self._counters[result] += 1
+            return copy.deepcopy(entry["answer"])
+
+    def put(self, prompt, answer):
+        text = answer["details"] if isinstance(answer, dict) else str(answer)
+        if not text or FAILED_ANSWER_RE.search(text):
+            return False
+        key = self._key(prompt)
+        if key is None:
+            return False
+        size = _answer_size(answer)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"answer": copy.deepcopy(answer), "size": size,
+                                  "expires_at": time.monotonic() + self.ttl}
+            self._buckets.setdefault(key[0], set()).add(key[1])
+            self._bytes += size
+            self._counters["stored"] += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+        return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        bucket = self._buckets.get(key[0])
+        if bucket is not None:
+            bucket.discard(key[1])
+            if not bucket:
+                del self._buckets[key[0]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["near_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["near_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Queries differing only in case or spacing hit the same entry
+def normalize_query(query):
+    return " ".join(str(query).lower().split())
+
+
+def make_cache_key(query, include_images):
+    return f"{int(bool(include_images))}|{normalize_query(query)}"
+
+
+# In-process LRU with a TTL, backed by an optional SQLite store that is
+# shared by every process pointing at the same file.
+class SearchCache:
+    def __init__(self, max_entries=256, ttl=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        if self.db_path:
+            self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _disk_get(self, key, now):
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, expires_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[1] <= now:
+                    conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    return None
+                return json.loads(row[0]), row[1]
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Search cache read failed: {e}")
+            return None
+
+    def _disk_set(self, key, response, expires_at):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(response), expires_at),
+                )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Search cache write failed: {e}")
+
+    def _remember(self, key, expires_at, response):
+        # Caller holds the lock
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def get(self, query, include_images=True):
+        key = make_cache_key(query, include_images)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._counters["expirations"] += 1
+        if self.db_path:
+            stored = self._disk_get(key, now)
+            if stored is not None:
+                response, expires_at = stored
+                with self._lock:
+                    self._remember(key, expires_at, response)
+                    self._counters["disk_hits"] += 1
+                return response
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def set(self, query, include_images, response):
+        key = make_cache_key(query, include_images)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, response)
+        if self.db_path:
+            self._disk_set(key, response, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM search_cache")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Another request holds the session's lease, or took it over while this one
+# was running
+class SessionBusy(RuntimeError):
+    pass
+
+
+# Live sessions kept in this process only, so a single API worker or the
+# Streamlit app. The least recently used session goes beyond max_sessions,
+# and sessions idle for ttl seconds expire.
+class MemorySessionStore:
+    shared = False
+
+    def __init__(self, max_sessions=10000, ttl=86400):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session id -> (last used, session), least recent first
+        self._counters = {"loads": 0, "misses": 0, "saves": 0, "evictions": 0, "expirations": 0}
+
+    def load(self, session_id):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and now - entry[0] > self.ttl:
+                del self._sessions[session_id]
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["loads"] += 1
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def exists(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry is not None and time.time() - entry[0] <= self.ttl
+
+    # Turns in a single process are serialized by the caller; leases only
+    # matter for stores shared between processes
+    def acquire(self, session_id, owner):
+        return True
+
+    def release(self, session_id, owner):
+        pass
+
+    def save(self, session, owner=None):
+        with self._lock:
+            self._sessions[session.session_id] = (time.time(), session)
+            self._sessions.move_to_end(session.session_id)
+            self._counters["saves"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["sessions"] = len(self._sessions)
+        return stats
+
+
+# Sessions as JSON rows in SQLite (WAL mode), shared by every worker process
+# pointing at the same file. load() rebuilds a session from its row with
+# restore(state); save() stores session.to_state(). A turn holds the
+# session's lease row from load to save, so two workers never run turns of
+# one conversation at once; a lease left by a crashed worker lapses after
+# lease_ttl seconds. Expired rows are removed once every `vacuum_every` saves.
+class SqliteSessionStore:
+    shared = True
+
+    def __init__(self, path, restore, ttl=86400, vacuum_every=500, lease_ttl=300):
+        self.path = path
+        self.restore = restore
+        self.ttl = ttl
+        self.vacuum_every = vacuum_every
+        self.lease_ttl = lease_ttl
+        self._lock = threading.Lock()
+        self._counters = {"loads": 0, "misses": 0, "saves": 0, "expirations": 0, "leases": 0, "busy": 0,
+                          "lost_leases": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_updated ON chat_sessions (updated_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_session_leases ("
+                "id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def load(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT state FROM chat_sessions WHERE id = ? AND updated_at > ?",
+                               (session_id, time.time() - self.ttl)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("loads")
+        return self.restore(json.loads(row[0]))
+
+    # Whether load() would find the session, without restoring it
+    def exists(self, session_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM chat_sessions WHERE id = ? AND updated_at > ?",
+                                (session_id, time.time() - self.ttl)).fetchone() is not None
+
+    # True when `owner` now holds the session's lease; False while another
+    # owner's lease is live
+    def acquire(self, session_id, owner):
+        now = time.time()
+        with self._connect() as conn:
+            acquired = conn.execute(
+                "INSERT INTO chat_session_leases (id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE chat_session_leases.expires_at <= ?",
+                (session_id, owner, now + self.lease_ttl, now),
+            ).rowcount > 0
+        self._count("leases" if acquired else "busy")
+        return acquired
+
+    def release(self, session_id, owner):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_session_leases WHERE id = ? AND owner = ?", (session_id, owner))
+
+    # With an owner, the row is only written while that owner still holds the
+    # lease; otherwise SessionBusy is raised and the turn is not stored.
+    def save(self, session, owner=None):
+        state = json.dumps(session.to_state())
+        with self._connect() as conn:
+            if owner is None:
+                conn.execute("INSERT OR REPLACE INTO chat_sessions (id, state, updated_at) VALUES (?, ?, ?)",
+                             (session.session_id, state, time.time()))
+            elif not conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (id, state, updated_at) SELECT ?, ?, ? "
+                "WHERE EXISTS (SELECT 1 FROM chat_session_leases WHERE id = ? AND owner = ?)",
+                (session.session_id, state, time.time(), session.session_id, owner),
+            ).rowcount:
+                self._count("lost_leases")
+                raise SessionBusy(f"lease on session {session.session_id} was lost before saving")
+            with self._lock:
+                self._counters["saves"] += 1
+                vacuum = self._counters["saves"] % self.vacuum_every == 0
+            if vacuum:
+                expired = conn.execute("DELETE FROM chat_sessions WHERE updated_at <= ?",
+                                       (time.time() - self.ttl,)).rowcount
+                conn.execute("DELETE FROM chat_session_leases WHERE expires_at <= ?", (time.time(),))
+                self._count("expirations", expired)
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    def stats(self):
+        with self._connect() as conn:
+            sessions = conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+        with self._lock:
+            stats = dict(self._counters)
+        stats["sessions"] = sessions
+        return stats
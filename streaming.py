@@ -0,0 +1,114 @@
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Status line shown while a tool runs, keyed by tool name
+TOOL_STATUS = {
+    "GetCarDetails": "Looking up {input}...",
+    "ComparePrices": "Comparing prices for {input}...",
+    "WhyBuyFromUs": "Checking what we can offer on the {input}...",
+    "ListAvailableCars": "Checking our stock...",
+    "SearchInventory": "Searching our stock...",
+}
+
+
+# Streams the agent's final answer into a Streamlit placeholder as Gemini
+# produces it. The conversational ReAct agent prefixes its answer with "AI:",
+# so tokens are buffered per LLM call and only the text after that prefix is
+# shown; intermediate "Thought/Action" steps never reach the user.
+#
+# Chat models only call the streaming API when a handler looks like a
+# streaming handler (the tap_output_* pair below); the agent's LLMChain offers
+# no other per-call switch.
+class StreamingAnswerHandler(BaseCallbackHandler):
+    # Called on the script thread even under agent.arun, where Streamlit elements live
+    run_inline = True
+
+    def __init__(self, answer_placeholder, status_placeholder=None, ai_prefix="AI:"):
+        self.answer_placeholder = answer_placeholder
+        self.status_placeholder = status_placeholder
+        self.ai_prefix = ai_prefix
+        self.started = time.perf_counter()
+        self.first_token_ms = None
+        self.first_answer_token_ms = None
+        self.streamed_answer = ""
+        self._buffer = ""
+
+    def _elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._buffer = ""
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._buffer = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.first_token_ms is None:
+            self.first_token_ms = self._elapsed_ms()
+        self._buffer += token
+        prefix_at = self._buffer.find(self.ai_prefix)
+        if prefix_at == -1:
+            return
+        answer = self._buffer[prefix_at + len(self.ai_prefix):].lstrip()
+        if not answer:
+            return
+        if self.first_answer_token_ms is None:
+            self.first_answer_token_ms = self._elapsed_ms()
+            self._set_status(None)
+        self.streamed_answer = answer
+        self._show_answer(answer)
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        name = (serialized or {}).get("name", "")
+        template = TOOL_STATUS.get(name, "Working on it...")
+        self._set_status(template.format(input=str(input_str).strip().title()))
+
+    def tap_output_iter(self, run_id, output):
+        return output
+
+    def tap_output_aiter(self, run_id, output):
+        return output
+
+    def _show_answer(self, answer):
+        self.answer_placeholder.markdown(answer + "▌")
+
+    def _set_status(self, text):
+        if self.status_placeholder is None:
+            return
+        if text:
+            self.status_placeholder.caption(text)
+        else:
+            self.status_placeholder.empty()
+
+    def finish(self):
+        self._set_status(None)
+        return {
+            "mode": "streaming",
+            "ttft_ms": self.first_answer_token_ms,
+            "first_llm_token_ms": self.first_token_ms,
+            "turn_ms": self._elapsed_ms(),
+        }
+
+
+# Same answer extraction, but tokens and tool progress go to emit(event, data)
+# instead of Streamlit, e.g. as server-sent events from chat_api.py. emit is
+# called on the agent's thread.
+class EventStreamHandler(StreamingAnswerHandler):
+    def __init__(self, emit, ai_prefix="AI:"):
+        super().__init__(None, ai_prefix=ai_prefix)
+        self.emit = emit
+        self._sent = ""
+
+    def _show_answer(self, answer):
+        if answer.startswith(self._sent):
+            delta = answer[len(self._sent):]
+        else:  # the agent started a new answer
+            delta = answer
+            self.emit("reset", {})
+        self._sent = answer
+        if delta:
+            self.emit("token", {"text": delta})
+
+    def _set_status(self, text):
+        self.emit("status", {"text": text or ""})
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_cache import ImageCache  # noqa: E402
+
+
+def fail_fetch(url, timeout=None):
+    raise AssertionError(f"downloaded {url} with the cache off")
+
+
+def test_disabled_cache_keeps_existing_files_and_downloads_nothing(tmp_path):
+    cached = tmp_path / "abc.jpg"
+    cached.write_bytes(b"x" * 1000)
+    cache = ImageCache(str(tmp_path), max_bytes=0, fetch=fail_fetch)
+    assert not cache.enabled
+    assert cache.fetch_all(["http://example.com/car.jpg"]) == []
+    assert cache.prefetch(["http://example.com/car.jpg"]) == {}
+    assert cached.exists()
+    assert cache.stats()["evictions"] == 0
+
+
+def test_cache_over_budget_evicts_oldest_files(tmp_path):
+    for name, mtime in (("old.jpg", 1), ("new.jpg", 2)):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (mtime, mtime))
+    cache = ImageCache(str(tmp_path), max_bytes=1500, fetch=fail_fetch)
+    assert not (tmp_path / "old.jpg").exists()
+    assert (tmp_path / "new.jpg").exists()
+    assert cache.stats()["files"] == 1
@@ -0,0 +1,37 @@
+import difflib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory_index import InventoryIndex  # noqa: E402
+
+KEYS = ["toyota corolla", "toyota camry", "honda civic", "ford mustang", "porsche 911", "subaru golf le 2009"]
+
+
+def close_match(query, keys):
+    matches = difflib.get_close_matches(query, keys, n=1, cutoff=0.7)
+    return matches[0] if matches else None
+
+
+def test_resolve_agrees_with_get_close_matches():
+    index = InventoryIndex(KEYS)
+    for query in ["toyota corola", "Honda Civc", "ford mustang", "porshe 911", "sbuar golf le", "spaceship", "suv"]:
+        assert index.resolve(query) == close_match(query.lower(), KEYS)
+
+
+def test_resolve_scores_past_the_shortlist_when_it_has_no_match():
+    # The reordered key shares more n-grams with the query but scores below the cutoff
+    keys = ["subaru golf le 2009", "golf le 2009 sbuar"]
+    index = InventoryIndex(keys, max_candidates=1)
+    shortlist, rest = index._candidates("sbuar golf le 2009")
+    assert (shortlist, rest) == (["golf le 2009 sbuar"], ["subaru golf le 2009"])
+    assert index.resolve("sbuar golf le 2009") == close_match("sbuar golf le 2009", keys) == "subaru golf le 2009"
+
+
+def test_removed_keys_are_not_matched():
+    index = InventoryIndex(KEYS)
+    index.remove("honda civic")
+    assert index.resolve("honda civc") is None
+    assert index.lookup_alias("civic") is None
+    assert index.lookup_alias("mustang") == "ford mustang"
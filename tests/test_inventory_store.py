@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory_store import InventoryStore, parse_inventory_query  # noqa: E402
+
+
+def make_store():
+    return InventoryStore.from_records([
+        {"model": "Toyota Corolla", "year": 2018, "price": 15000, "mileage": 60000, "body_type": "Sedan",
+         "interior": "cloth", "details": "", "benefits": ""},
+        {"model": "Honda CR-V", "year": 2020, "price": 24000, "mileage": 30000, "body_type": "SUV",
+         "interior": "leather", "details": "", "benefits": ""},
+        {"model": "Ford Escape", "year": 2019, "price": 21000, "mileage": 45000, "body_type": "SUV",
+         "interior": "cloth", "details": "", "benefits": ""},
+    ])
+
+
+def test_query_filters_sorts_and_limits():
+    store = make_store()
+    cars = store.query(**parse_inventory_query("body_type=suv, max_price=25k, sort_by=price, limit=1"))
+    assert [car["model"] for car in cars] == ["ford escape"]
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_query_rejects_a_limit_below_one(limit):
+    with pytest.raises(ValueError, match="limit"):
+        make_store().query(**parse_inventory_query(f"limit={limit}"))
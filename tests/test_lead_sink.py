@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lead_sink import CsvLeadBackend, LeadSink, SqliteLeadBackend, read_csv_leads  # noqa: E402
+
+# leads.csv as the original app wrote it: no header row
+LEGACY_CSV = (
+    "Ali Khan,ali@example.com,+92 300 1234567\r\n"
+    "Sara,SARA@example.com,0300-7654321\r\n"
+    "John Smith,john@example.com,+1 555 0100\r\n"
+)
+
+
+# Wraps a backend and raises on its first `failures` writes
+class FlakyBackend:
+    def __init__(self, backend, failures):
+        self.backend = backend
+        self.failures = failures
+
+    def write_batch(self, leads):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk unavailable")
+        return self.backend.write_batch(leads)
+
+
+LEAD = {"name": "Ali Khan", "email": "ali@example.com", "whatsapp": "+92 300 1234567"}
+
+
+def write_legacy_csv(tmp_path):
+    path = tmp_path / "leads.csv"
+    path.write_text(LEGACY_CSV, newline="")
+    return str(path)
+
+
+def test_read_csv_leads_without_header(tmp_path):
+    leads = read_csv_leads(write_legacy_csv(tmp_path))
+    assert [lead["email"] for lead in leads] == ["ali@example.com", "sara@example.com", "john@example.com"]
+    assert leads[0] == {"name": "Ali Khan", "email": "ali@example.com", "whatsapp": "+923001234567"}
+
+
+def test_read_csv_leads_with_header_skips_blank_rows(tmp_path):
+    path = tmp_path / "leads.csv"
+    path.write_text("name,email,whatsapp\r\nAli Khan,ali@example.com,+92 300 1234567\r\nNobody,,\r\n", newline="")
+    assert read_csv_leads(str(path)) == [{"name": "Ali Khan", "email": "ali@example.com", "whatsapp": "+923001234567"}]
+
+
+def test_sqlite_migrates_headerless_csv(tmp_path):
+    csv_path = write_legacy_csv(tmp_path)
+    db_path = str(tmp_path / "leads.db")
+    backend = SqliteLeadBackend(db_path, migrate_csv=csv_path)
+    assert backend.migrate_csv(csv_path) == 0
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT name, email, whatsapp FROM leads ORDER BY id").fetchall()
+    assert rows == [
+        ("Ali Khan", "ali@example.com", "+923001234567"),
+        ("Sara", "sara@example.com", "03007654321"),
+        ("John Smith", "john@example.com", "+15550100"),
+    ]
+
+
+def test_csv_backend_skips_leads_already_in_headerless_file(tmp_path):
+    csv_path = write_legacy_csv(tmp_path)
+    backend = CsvLeadBackend(csv_path)
+    written = backend.write_batch([
+        {"name": "Sara", "email": "sara@example.com", "whatsapp": "03007654321"},
+        {"name": "Omar", "email": "omar@example.com", "whatsapp": "+971501234567"},
+    ])
+    assert written == 1
+    assert [lead["email"] for lead in read_csv_leads(csv_path)][-1] == "omar@example.com"
+    assert len(read_csv_leads(csv_path)) == 4
+
+
+def test_sink_retries_a_failed_write(tmp_path):
+    csv_path = str(tmp_path / "leads.csv")
+    sink = LeadSink(FlakyBackend(CsvLeadBackend(csv_path), failures=1), max_latency=0.01, retry_delay=0.01)
+    try:
+        assert sink.submit(LEAD)
+        sink.flush()
+    finally:
+        sink.close()
+    assert read_csv_leads(csv_path) == [{"name": "Ali Khan", "email": "ali@example.com", "whatsapp": "+923001234567"}]
+    stats = sink.stats()
+    assert (stats["errors"], stats["retries"], stats["written"], stats["fallback"]) == (1, 1, 1, 0)
+
+
+def test_sink_keeps_leads_it_cannot_write_in_the_fallback_file(tmp_path):
+    fallback = tmp_path / "leads.failed.jsonl"
+    sink = LeadSink(FlakyBackend(CsvLeadBackend(str(tmp_path / "leads.csv")), failures=100), max_latency=0.01,
+                    retry_delay=0.01, max_attempts=3, fallback_path=str(fallback))
+    try:
+        assert sink.submit(LEAD)
+        sink.flush()
+    finally:
+        sink.close()
+    assert [json.loads(line)["email"] for line in fallback.read_text().splitlines()] == ["ali@example.com"]
+    assert sink.stats()["fallback"] == 1
@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_prices import extract_prices, price_stats  # noqa: E402
+
+
+def test_extract_prices_skips_mileage_payments_and_discounts():
+    text = ("Listed at $18,500 with 42,000 miles, or $299/mo with $2,000 down. "
+            "Similar cars $18k-$22k, one at 19500 USD.")
+    assert sorted(extract_prices(text)) == [18500, 19500, 20000]
+
+
+def test_extract_prices_drops_amounts_outside_the_price_range():
+    assert extract_prices("$18-22k; parts from $45; was $1,200,000") == [20000]
+
+
+def test_price_stats_drops_outliers():
+    stats = price_stats([18000, 19000, 20000, 21000, 22000, 95000])
+    assert (stats["samples"], stats["outliers"]) == (5, 1)
+    assert (stats["median"], stats["trimmed_mean"], stats["low"], stats["high"]) == (20000, 20000.0, 18000, 22000)
+
+
+def test_price_stats_without_samples():
+    assert price_stats([])["median"] is None
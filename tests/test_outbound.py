@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbound import OutboundClient, OutboundOverloaded, TokenBucket  # noqa: E402
+
+
+def test_bucket_keeps_the_reserve_for_callers_without_one():
+    bucket = TokenBucket(rate=0.001, burst=4)
+    deadline = time.monotonic() + 0.05
+    assert bucket.acquire(deadline, reserve=2) is not None
+    assert bucket.acquire(deadline, reserve=2) is not None
+    assert bucket.acquire(deadline, reserve=2) is None
+    assert bucket.acquire(deadline) is not None
+    assert bucket.acquire(deadline) is not None
+
+
+def test_background_calls_leave_capacity_for_interactive_ones():
+    client = OutboundClient("test", rate=0.001, burst=4, max_wait=0.05, background_max_wait=0.05)
+    assert client.call(lambda: "refresh", background=True) == "refresh"
+    assert client.call(lambda: "refresh", background=True) == "refresh"
+    with pytest.raises(OutboundOverloaded):
+        client.call(lambda: "refresh", background=True)
+    assert client.call(lambda: "answer") == "answer"
+    assert client.call(lambda: "answer") == "answer"
+
+
+def test_interactive_call_does_not_join_a_background_call():
+    client = OutboundClient("test", rate=1000, burst=10)
+    release = threading.Event()
+    calls = []
+
+    def search(name):
+        calls.append(name)
+        if name == "background":
+            release.wait(5)
+        return name
+
+    worker = threading.Thread(target=lambda: client.call(search, "background", key="q", background=True))
+    worker.start()
+    while not calls:
+        time.sleep(0.001)
+    assert client.call(search, "interactive", key="q") == "interactive"
+    release.set()
+    worker.join()
+    assert calls == ["background", "interactive"]
+
+
+def test_identical_calls_share_one_request():
+    client = OutboundClient("test", rate=1000, burst=10)
+    release = threading.Event()
+    calls = []
+
+    def search(query):
+        calls.append(query)
+        release.wait(5)
+        return f"results for {query}"
+
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(client.call(search, "suv", key="suv")))
+               for _ in range(4)]
+    workers[0].start()
+    while not calls:
+        time.sleep(0.001)
+    for worker in workers[1:]:
+        worker.start()
+    time.sleep(0.05)
+    release.set()
+    for worker in workers:
+        worker.join()
+    assert calls == ["suv"]
+    assert results == ["results for suv"] * 4
+
+
+def test_calls_beyond_the_queue_are_rejected():
+    client = OutboundClient("test", rate=5, burst=1, max_queue=1, max_wait=1.0)
+    assert client.call(lambda: "first") == "first"
+    # The next token is 0.2s away, so this caller waits in the queue for it
+    waiter = threading.Thread(target=client.call, args=(lambda: "second",))
+    waiter.start()
+    while client.stats()["waiting"] < 1:
+        time.sleep(0.001)
+    with pytest.raises(OutboundOverloaded, match="already waiting"):
+        client.call(lambda: "third")
+    waiter.join()
+
+
+def test_retryable_errors_are_retried():
+    client = OutboundClient("test", rate=1000, burst=10, retries=2, base_delay=0)
+    attempts = []
+
+    def search():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("429 Too Many Requests")
+        return "results"
+
+    assert client.call(search) == "results"
+    assert len(attempts) == 3
+
+
+def test_other_errors_are_not_retried():
+    client = OutboundClient("test", rate=1000, burst=10, retries=2, base_delay=0)
+    attempts = []
+
+    def search():
+        attempts.append(1)
+        raise ValueError("invalid API key")
+
+    with pytest.raises(ValueError):
+        client.call(search)
+    assert len(attempts) == 1
@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache  # noqa: E402
+
+MODELS = ["toyota corolla", "honda civic"]
+
+
+def find_models(text):
+    return [model for model in MODELS if model in text or model.split()[1] in text]
+
+
+def make_cache(versions=None, **kwargs):
+    versions = {} if versions is None else versions
+    return ResponseCache(find_models, lambda models: tuple(versions.get(model, 0) for model in models), **kwargs)
+
+
+def test_same_question_in_other_words_is_a_hit():
+    cache = make_cache()
+    assert cache.put("What is the price of the Toyota Corolla?", "The Corolla is $15,000.")
+    assert cache.get("price of the corolla please") == "The Corolla is $15,000."
+    assert cache.get("What is the price of the Honda Civic?") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_context_dependent_and_personal_prompts_are_not_cached():
+    cache = make_cache()
+    for prompt in ["Is it automatic?", "What about the cheaper one?", "My budget is 20k, which Honda Civic?",
+                   "I'm Ali, email me about the civic", "Can I book a test drive of the corolla?", "hi there"]:
+        assert cache.normalize(prompt) is None
+        assert not cache.put(prompt, "An answer.")
+        assert cache.get(prompt) is None
+    assert cache.stats()["skipped"] == 6
+
+
+def test_failed_answers_are_not_cached():
+    cache = make_cache()
+    assert not cache.put("price of the corolla", "An error occurred: timeout")
+    assert cache.stats()["size"] == 0
+
+
+def test_a_new_version_of_the_model_misses():
+    versions = {}
+    cache = make_cache(versions)
+    cache.put("price of the corolla", {"details": "$15,000", "images": ["https://example.com/corolla.jpg"]})
+    assert cache.get("price of the corolla")["details"] == "$15,000"
+    versions["toyota corolla"] = 1
+    assert cache.get("price of the corolla") is None
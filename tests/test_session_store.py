@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import MemorySessionStore, SessionBusy, SqliteSessionStore  # noqa: E402
+
+
+class FakeSession:
+    def __init__(self, session_id, turns=0):
+        self.session_id = session_id
+        self.turns = turns
+
+    def to_state(self):
+        return {"session_id": self.session_id, "turns": self.turns}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state["session_id"], state["turns"])
+
+
+def make_store(tmp_path, **kwargs):
+    return SqliteSessionStore(str(tmp_path / "sessions.db"), FakeSession.from_state, **kwargs)
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    store = make_store(tmp_path)
+    assert not store.exists("abc")
+    store.save(FakeSession("abc", turns=3))
+    assert store.exists("abc")
+    assert store.load("abc").turns == 3
+    assert store.delete("abc")
+    assert store.load("abc") is None
+
+
+def test_lease_is_exclusive_until_released(tmp_path):
+    store = make_store(tmp_path)
+    assert store.acquire("abc", "worker-1")
+    assert not store.acquire("abc", "worker-2")
+    store.release("abc", "worker-2")
+    assert not store.acquire("abc", "worker-2")
+    store.release("abc", "worker-1")
+    assert store.acquire("abc", "worker-2")
+    assert (store.stats()["leases"], store.stats()["busy"]) == (2, 2)
+
+
+def test_expired_lease_can_be_taken_over(tmp_path):
+    store = make_store(tmp_path, lease_ttl=0.05)
+    assert store.acquire("abc", "crashed")
+    time.sleep(0.1)
+    assert store.acquire("abc", "worker-2")
+
+
+def test_save_after_losing_the_lease_raises(tmp_path):
+    store = make_store(tmp_path, lease_ttl=0.05)
+    assert store.acquire("abc", "worker-1")
+    store.save(FakeSession("abc", turns=1), "worker-1")
+    time.sleep(0.1)
+    assert store.acquire("abc", "worker-2")
+    with pytest.raises(SessionBusy):
+        store.save(FakeSession("abc", turns=2), "worker-1")
+    assert store.load("abc").turns == 1
+    assert store.stats()["lost_leases"] == 1
+
+
+def test_memory_store_expires_idle_sessions():
+    store = MemorySessionStore(ttl=0.05)
+    store.save(FakeSession("abc"))
+    assert store.exists("abc")
+    time.sleep(0.1)
+    assert not store.exists("abc")
+    assert store.load("abc") is None
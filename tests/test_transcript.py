@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript import Transcript, TranscriptHistory  # noqa: E402
+
+
+def fill(transcript, turns, size=500):
+    for turn in range(turns):
+        transcript.append("user", f"question {turn} " + "q" * size)
+        transcript.append("assistant", f"answer {turn} " + "a" * size)
+
+
+def test_memory_stays_within_the_byte_budget(tmp_path):
+    transcript = Transcript("s1", str(tmp_path), max_bytes=2048)
+    fill(transcript, 12)
+    stats = transcript.stats()
+    assert stats["bytes"] <= 2048
+    assert stats["spilled"] > 0
+    assert stats["messages"] == 24
+    assert os.path.exists(transcript.spill_path)
+
+
+def test_spilled_history_reads_back_in_order(tmp_path):
+    transcript = Transcript("s1", str(tmp_path), max_bytes=2048)
+    fill(transcript, 12)
+    contents = [entry["content"].split(" ")[:2] for entry in transcript.page(0)]
+    assert contents == [[role, str(turn)] for turn in range(12) for role in ("question", "answer")]
+    assert [entry["content"].split(" ")[:2] for entry in transcript.tail(2)] == [["question", "11"], ["answer", "11"]]
+
+
+def test_newest_turn_stays_in_memory_even_when_over_budget(tmp_path):
+    transcript = Transcript("s1", str(tmp_path), max_bytes=100)
+    fill(transcript, 3, size=1000)
+    assert transcript.stats()["in_memory"] == 2
+    transcript.update_last(images=["http://example.com/car.jpg"])
+    assert transcript.tail(1)[0]["images"] == ["http://example.com/car.jpg"]
+
+
+def test_history_window_skips_messages_hidden_from_memory(tmp_path):
+    transcript = Transcript("s1", str(tmp_path), max_bytes=2048)
+    fill(transcript, 4)
+    transcript.append("user", "broken", memory=False)
+    transcript.append("assistant", "An error occurred", memory=False)
+    history = TranscriptHistory(transcript, start=2)
+    assert len(history.messages) == 6
+    history.drop_oldest(2)
+    assert history.start == 4 and len(history.messages) == 4
@@ -0,0 +1,64 @@
+import math
+import statistics
+import threading
+import time
+
+
+# Splits one script run into named phases, e.g. "inventory" or "render"
+class PhaseTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def total_ms(self):
+        return (self._last - self.started) * 1000
+
+
+# Process-wide record of script runs: the first run is the cold start,
+# every later one is a rerun.
+class RunTimings:
+    def __init__(self, keep=200):
+        self.keep = keep
+        self.cold_start = None
+        self.reruns = []
+        self._lock = threading.Lock()
+
+    def record(self, timer):
+        entry = {"total_ms": timer.total_ms(), "phases": list(timer.phases)}
+        with self._lock:
+            if self.cold_start is None:
+                self.cold_start = entry
+                return "cold start"
+            self.reruns.append(entry)
+            del self.reruns[:-self.keep]
+            return "rerun"
+
+    def summary(self):
+        with self._lock:
+            reruns = [entry["total_ms"] for entry in self.reruns]
+            summary = {
+                "cold_start_ms": self.cold_start["total_ms"] if self.cold_start else None,
+                "reruns": len(reruns),
+                "last_rerun_ms": reruns[-1] if reruns else None,
+                "median_rerun_ms": statistics.median(reruns) if reruns else None,
+            }
+        return summary
+
+
+# Nearest-rank percentile, q in [0, 100]
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def format_phases(timer):
+    return ", ".join(f"{name} {ms:.1f} ms" for name, ms in timer.phases)
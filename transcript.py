@@ -0,0 +1,152 @@
+import json
+import os
+import time
+from itertools import islice
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+MESSAGE_TYPES = {"user": HumanMessage, "assistant": AIMessage}
+ROLES = {"human": "user", "ai": "assistant"}
+
+
+# Rough in-memory size of an entry; metrics dicts count as a flat 256 bytes
+def _entry_size(entry):
+    return len(entry["content"]) + sum(len(url) for url in entry.get("images", ())) + 256 * ("metrics" in entry)
+
+
+# Removes spill files not written to for max_age seconds, e.g. of sessions that ended
+def remove_stale_spill_files(spill_dir, max_age):
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(spill_dir):
+        path = os.path.join(spill_dir, name)
+        try:
+            if name.endswith(".jsonl") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+# One conversation's messages, the single copy read by both the chat UI and
+# the agent's memory. An entry is {"role", "content"} plus optional "images"
+# (URLs, rendered from the image cache), "metrics", and "memory": False for
+# messages the agent never saw, such as error replies. The newest messages
+# stay in memory up to max_bytes; older ones are appended to a JSON-lines
+# file in spill_dir and only read back for pages of old history. The newest
+# min_entries always stay in memory (the turn being recorded), so a single
+# message larger than max_bytes is the only way past the budget.
+class Transcript:
+    def __init__(self, session_id, spill_dir=None, max_bytes=256 * 1024, min_entries=2):
+        self.session_id = session_id
+        self.spill_dir = spill_dir
+        self.max_bytes = max_bytes
+        self.min_entries = min_entries
+        self.spilled = 0  # entries moved to the spill file
+        self._entries = []  # newest entries, oldest first
+        self._bytes = 0
+
+    @property
+    def spill_path(self):
+        return os.path.join(self.spill_dir, f"{self.session_id}.jsonl") if self.spill_dir else None
+
+    def __len__(self):
+        return self.spilled + len(self._entries)
+
+    def append(self, role, content, **fields):
+        entry = {"role": role, "content": content, **fields}
+        self._entries.append(entry)
+        self._bytes += _entry_size(entry)
+        if self._bytes > self.max_bytes and self.spill_dir:
+            self._spill()
+        return entry
+
+    def update_last(self, **fields):
+        entry = self._entries[-1]
+        self._bytes -= _entry_size(entry)
+        entry.update(fields)
+        self._bytes += _entry_size(entry)
+
+    # Moves the oldest entries to disk until half the budget is free
+    def _spill(self):
+        count, freed = 0, 0
+        while (self._bytes - freed > self.max_bytes // 2
+               and len(self._entries) - count > self.min_entries):
+            freed += _entry_size(self._entries[count])
+            count += 1
+        if not count:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self.spill_path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in self._entries[:count]))
+        del self._entries[:count]
+        self._bytes -= freed
+        self.spilled += count
+
+    # Entries start..stop (transcript indexes, oldest first)
+    def page(self, start, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = max(0, start)
+        entries = []
+        if start < self.spilled:
+            with open(self.spill_path) as f:
+                entries = [json.loads(line) for line in islice(f, start, min(stop, self.spilled))]
+        return entries + self._entries[max(0, start - self.spilled):max(0, stop - self.spilled)]
+
+    def tail(self, count):
+        return self.page(len(self) - count)
+
+    def discard(self):
+        if self.spilled:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+        self.spilled = 0
+        self._entries = []
+        self._bytes = 0
+
+    def to_state(self):
+        return {"spilled": self.spilled, "entries": self._entries}
+
+    @classmethod
+    def from_state(cls, session_id, state, spill_dir=None, max_bytes=256 * 1024):
+        transcript = cls(session_id, spill_dir, max_bytes)
+        transcript.spilled = state["spilled"]
+        transcript._entries = state["entries"]
+        transcript._bytes = sum(_entry_size(entry) for entry in transcript._entries)
+        return transcript
+
+    def stats(self):
+        return {"messages": len(self), "in_memory": len(self._entries), "bytes": self._bytes, "spilled": self.spilled}
+
+
+# The agent memory's view of a transcript: the entries from `start` on, as
+# LangChain messages. Memory writes append to the transcript, and pruning
+# moves `start` forward instead of deleting anything.
+class TranscriptHistory(BaseChatMessageHistory):
+    def __init__(self, transcript, start=0):
+        self.transcript = transcript
+        self.start = start
+
+    @property
+    def messages(self):
+        return [MESSAGE_TYPES[entry["role"]](content=entry["content"])
+                for entry in self.transcript.page(self.start) if entry.get("memory", True)]
+
+    def add_messages(self, messages):
+        for message in messages:
+            self.transcript.append(ROLES.get(message.type, message.type), message.content)
+
+    # Moves the window past its oldest `count` messages
+    def drop_oldest(self, count):
+        for entry in self.transcript.page(self.start):
+            if not count:
+                break
+            self.start += 1
+            count -= entry.get("memory", True)
+
+    def clear(self):
+        self.start = len(self.transcript)